@@ -0,0 +1,149 @@
+'''
+Scaling benchmark for the parallel tree build.
+
+Builds a synthetic account of the given size with the sequential build and with 1 to 16 worker processes,
+checks that every parallel build gives exactly the same tree as the sequential one, and prints the timings.
+The trees are compared list by list (fields, times, sublists, parents and hashes), along with the pruned stubs
+and their indexes. No network access is needed.
+
+Usage:
+    python benchmarks/bench_parallel_build.py --lists 300000
+    python benchmarks/bench_parallel_build.py --lists 300000 --skip-completed --max-depth 4
+'''
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'workflowy'))
+
+from workflowy_project import WorkFlowyProject
+
+
+def generate_tree(count: int, seed: int = 0):
+    '''
+    Generates raw top level lists in the format of rootProjectChildren.
+
+    Args:
+        count (int): The number of lists to generate.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        list: The raw top level lists.
+    '''
+    generator = random.Random(seed)
+    tags = ['#todo', '#waiting', '#someday', '@home', '@work']
+    root = {'ch': []}
+    open_lists = [(root, 0)]
+    for index in range(count):
+        parent, depth = open_lists[generator.randrange(len(open_lists))]
+        raw_list = {
+            'id': '%08x-%04x-%04x-%04x-%012x' % (index, 0, 0, 0, generator.getrandbits(48)),
+            'nm': 'Item %d %s' % (index, generator.choice(tags)),
+            'ct': index,
+            'lm': index + generator.randrange(1000),
+        }
+        if generator.random() < 0.3:
+            raw_list['no'] = 'Notes for item %d' % index
+        if generator.random() < 0.4:
+            raw_list['cp'] = index + 1000
+        parent.setdefault('ch', []).append(raw_list)
+        if depth < 8:
+            open_lists.append((raw_list, depth + 1))
+    return root['ch']
+
+
+def build(init_data: dict, workers: int = None, skip_completed: bool = False, max_depth: int = None):
+    '''
+    Builds a tree from the given initialization data and times it.
+
+    Args:
+        init_data (dict): The initialization data.
+        workers (int, optional): The number of worker processes. Defaults to None (sequential).
+        skip_completed (bool, optional): If True, completed lists are pruned. Defaults to False.
+        max_depth (int, optional): The deepest level to load. Defaults to None (no limit).
+
+    Returns:
+        tuple: The elapsed time in seconds and the project.
+    '''
+    project = WorkFlowyProject('0' * 32)
+    start = time.perf_counter()
+    project.load_tree(init_data, skip_completed=skip_completed, max_depth=max_depth, workers=workers)
+    return time.perf_counter() - start, project
+
+
+def compare(expected, project):
+    '''
+    Compares two built trees.
+
+    Args:
+        expected (WorkFlowyProject): The project built sequentially.
+        project (WorkFlowyProject): The project built in parallel.
+
+    Returns:
+        str or None: The first difference found, or None if the trees are the same.
+    '''
+    if list(project.all_lists) != list(expected.all_lists):
+        return 'all_lists has different IDs or order'
+    for id, expected_list in expected.all_lists.items():
+        sublist = project.all_lists[id]
+        fields = ('name', 'description', 'level', 'creation_time', 'last_modified_time', 'completed_time')
+        for field in fields:
+            if getattr(sublist, field) != getattr(expected_list, field):
+                return 'list %s has a different %s' % (id, field)
+        if [child.id for child in sublist.sublists] != [child.id for child in expected_list.sublists]:
+            return 'list %s has different sublists' % id
+    if project.parent_ids != expected.parent_ids:
+        return 'parent_ids differ'
+    if project.hashes != expected.hashes:
+        return 'hashes differ'
+
+    if list(project.pruned_lists) != list(expected.pruned_lists):
+        return 'pruned_lists has different IDs or order'
+    for id, expected_stub in expected.pruned_lists.items():
+        stub = project.pruned_lists[id]
+        if (stub['parent_id'], stub['index']) != (expected_stub['parent_id'], expected_stub['index']) \
+                or stub['raw'] is not expected_stub['raw'] or stub['siblings'] is not expected_stub['siblings']:
+            return 'stub %s differs' % id
+    if project.pruned_parents != expected.pruned_parents:
+        return 'pruned_parents differ'
+    # The index of the pruned regions is built on first use
+    project.get_pruned_root(None)
+    expected.get_pruned_root(None)
+    if project.pruned_index != expected.pruned_index:
+        return 'pruned_index differs'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lists', type=int, default=200000, help='number of lists in the synthetic account')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per configuration, the best is kept')
+    parser.add_argument('--skip-completed', action='store_true', help='prune completed lists')
+    parser.add_argument('--max-depth', type=int, default=None, help='deepest level to load, deeper lists are pruned')
+    args = parser.parse_args()
+
+    init_data = {
+        'projectTreeData': {
+            'clientId': None,
+            'mainProjectTreeInfo': {
+                'rootProjectChildren': generate_tree(args.lists),
+                'dateJoinedTimestampInSeconds': 1500000000,
+                'initialMostRecentOperationTransactionId': None
+            }
+        }
+    }
+
+    options = {'skip_completed': args.skip_completed, 'max_depth': args.max_depth}
+    baseline, expected = min((build(init_data, **options) for _ in range(args.repeat)), key=lambda result: result[0])
+    print('lists: %d, cpus: %d' % (args.lists, os.cpu_count()))
+    print('%-10s %10s %8s' % ('workers', 'seconds', 'speedup'))
+    print('%-10s %10.3f %8.2f' % ('sequential', baseline, 1.0))
+
+    for workers in (1, 2, 4, 8, 12, 16):
+        elapsed, project = min((build(init_data, workers, **options) for _ in range(args.repeat)), key=lambda result: result[0])
+        difference = compare(expected, project)
+        if difference:
+            raise SystemExit('Parallel build with %d workers does not match the sequential build: %s' % (workers, difference))
+        print('%-10d %10.3f %8.2f' % (workers, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
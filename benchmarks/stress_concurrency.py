@@ -0,0 +1,213 @@
+'''
+Concurrency stress test for a shared project.
+
+Builds a synthetic account, then runs reader threads (searches, lookups, parents, sublists and hashes) and
+writer threads (creates, renames, moves, deletes and completions) against the same project at once. Pushes are
+acknowledged locally after an optional delay standing in for the network, so no network access is needed.
+When all threads are done, the local tree is checked for consistency: every list must be in all_lists and
+parent_ids under its parent, one level below it, and have the hash computed again from its content.
+
+The exit status is 0 if the tree is consistent and no thread raised an unexpected exception, and 1 otherwise,
+so the test can be run from CI.
+
+Usage:
+    python benchmarks/stress_concurrency.py --readers 8 --writers 8
+'''
+import argparse, os, random, sys, threading, time, traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'workflowy'))
+
+from workflowy_exception import WorkFlowyException
+from workflowy_project import WorkFlowyProject
+from workflowy_transport import WorkFlowyTransport
+from bench_parallel_build import generate_tree
+
+
+class OfflineTransport(WorkFlowyTransport):
+    '''
+    A transport acknowledging every push without sending it, after the given delay.
+    '''
+
+    def __init__(self, latency: float = 0):
+        super().__init__(session_id='0' * 32)
+        self.latency = latency
+        self.transaction_id = 0
+
+
+    def push_and_poll(self, operations: list = []):
+        with self.lock:
+            if self.latency:
+                time.sleep(self.latency)
+            self.transaction_id += 1
+            self.most_recent_operation_transaction_id = str(self.transaction_id)
+            return {'results': [{
+                'new_most_recent_operation_transaction_id': self.most_recent_operation_transaction_id,
+                'concurrent_remote_operation_transactions': []
+            }]}
+
+
+def reader(project, main_list, iterations: int, seed: int, errors: list):
+    '''
+    Reads random parts of the tree.
+
+    Args:
+        project (WorkFlowyProject): The project.
+        main_list (WorkFlowyList): The main list of the project.
+        iterations (int): The number of reads.
+        seed (int): The random seed.
+        errors (list): The list the tracebacks of unexpected exceptions are added to.
+    '''
+    generator = random.Random(seed)
+    for _ in range(iterations):
+        try:
+            main_list.search_sublist('#todo', get_all=True)
+            with project.lock.read():
+                ids = [id for id in project.all_lists if id is not None]
+            if not ids:
+                continue
+            sublist = main_list.get_list(generator.choice(ids))
+            sublist.get_parent()
+            sublist.get_sublists()
+            sublist.get_hash()
+        except WorkFlowyException as e:
+            # The list may have been deleted by a writer since the IDs were read
+            if 'not found' not in str(e):
+                errors.append(traceback.format_exc())
+        except Exception:
+            errors.append(traceback.format_exc())
+
+
+def writer(project, main_list, iterations: int, seed: int, errors: list):
+    '''
+    Changes random parts of the tree.
+
+    Args:
+        project (WorkFlowyProject): The project.
+        main_list (WorkFlowyList): The main list of the project.
+        iterations (int): The number of changes.
+        seed (int): The random seed.
+        errors (list): The list the tracebacks of unexpected exceptions are added to.
+    '''
+    generator = random.Random(seed)
+    for _ in range(iterations):
+        try:
+            with project.lock.read():
+                lists = [sublist for sublist in project.all_lists.values() if sublist.level > 0]
+            if not lists:
+                main_list.create_sublist('Item', 'Created by a writer')
+                continue
+
+            sublist = generator.choice(lists)
+            action = generator.random()
+            if action < 0.3:
+                sublist.create_sublist('Item %d' % generator.randrange(1000), 'Created by a writer')
+            elif action < 0.5:
+                sublist.set_name('Renamed %d #todo' % generator.randrange(10))
+            elif action < 0.7:
+                sublist.move(generator.choice(lists), generator.randrange(3))
+            elif action < 0.8:
+                sublist.delete()
+            else:
+                sublist.set_complete(generator.random() < 0.5)
+        except WorkFlowyException as e:
+            # Moves into their own subtree are refused, and lists may have been deleted by another writer
+            if 'not found' not in str(e) and 'Destination' not in str(e):
+                errors.append(traceback.format_exc())
+        except Exception:
+            errors.append(traceback.format_exc())
+
+
+def check_consistency(project, main_list):
+    '''
+    Checks that all_lists, parent_ids, the levels and the hashes agree with the tree under the main list.
+
+    Args:
+        project (WorkFlowyProject): The project.
+        main_list (WorkFlowyList): The main list of the project.
+
+    Returns:
+        list: The problems found, empty if the tree is consistent.
+    '''
+    problems = []
+    seen = set()
+
+    def visit(sublist, parent):
+        key = None if sublist.level == 0 else sublist.id
+        seen.add(key)
+        if project.all_lists.get(key) is not sublist:
+            problems.append('List %s is not in all_lists' % sublist.id)
+        if parent is not None:
+            if sublist.level != parent.level + 1:
+                problems.append('List %s is at level %d under a list at level %d' % (sublist.id, sublist.level, parent.level))
+            expected_parent = parent.id if parent.level > 0 else None
+            if project.parent_ids.get(sublist.id) != expected_parent:
+                problems.append('List %s has parent %s in parent_ids instead of %s'
+                                % (sublist.id, project.parent_ids.get(sublist.id), expected_parent))
+
+        child_hashes = [visit(child, sublist) for child in sublist.sublists]
+        computed = WorkFlowyProject.compute_hash(key, sublist.name, sublist.description, sublist.is_completed(), child_hashes)
+        if project.hashes.get(key) != computed:
+            problems.append('List %s has a stale hash' % sublist.id)
+        return computed
+
+    with project.lock.read():
+        visit(main_list, None)
+        problems.extend('List %s is in all_lists but not in the tree' % id for id in set(project.all_lists) - seen)
+        problems.extend('List %s is in parent_ids but not in the tree' % id for id in set(project.parent_ids) - seen)
+        problems.extend('List %s is in hashes but not in the tree' % id for id in set(project.hashes) - seen)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lists', type=int, default=2000, help='number of lists in the synthetic account')
+    parser.add_argument('--readers', type=int, default=8, help='number of reader threads')
+    parser.add_argument('--writers', type=int, default=8, help='number of writer threads')
+    parser.add_argument('--iterations', type=int, default=100, help='number of operations per thread')
+    parser.add_argument('--latency', type=float, default=0.001, help='simulated duration of a push, in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    init_data = {
+        'projectTreeData': {
+            'clientId': None,
+            'mainProjectTreeInfo': {
+                'rootProjectChildren': generate_tree(args.lists, args.seed),
+                'dateJoinedTimestampInSeconds': 1500000000,
+                'initialMostRecentOperationTransactionId': '0'
+            }
+        }
+    }
+
+    project = WorkFlowyProject('0' * 32)
+    project.transport = OfflineTransport(args.latency)
+    main_list = project.load_tree(init_data)
+
+    errors = []
+    threads = [threading.Thread(target=reader, args=(project, main_list, args.iterations, args.seed * 1000 + index, errors))
+               for index in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(project, main_list, args.iterations, args.seed * 1000 + 500 + index, errors))
+                for index in range(args.writers)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    problems = check_consistency(project, main_list)
+    print('readers: %d, writers: %d, iterations: %d, seconds: %.3f, lists left: %d'
+          % (args.readers, args.writers, args.iterations, elapsed, len(project.all_lists) - 1))
+    for error in errors[:5]:
+        print(error)
+    for problem in problems[:20]:
+        print(problem)
+    if errors or problems:
+        print('%d unexpected exceptions, %d consistency problems' % (len(errors), len(problems)))
+        sys.exit(1)
+    print('consistent')
+
+
+if __name__ == '__main__':
+    main()
@@ -12,8 +12,8 @@ class WorkFlowyAccount:
         invite_link (str): The invite link for the account.
     """
 
-    def __init__(self, session_id):
-        self.transport = WorkFlowyTransport(session_id)
+    def __init__(self, session_id, session_manager=None):
+        self.transport = WorkFlowyTransport(session_id, session_manager=session_manager)
         init_data = self.transport.get_initialization_data()
         self.email = init_data['user']
         self.name = init_data['fullName']
@@ -0,0 +1,207 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import hashlib, multiprocessing, threading
+
+# The raw lists of the build a forked worker belongs to, so that they do not need to be pickled for every chunk.
+# It is only set in the workers, by share_raw_lists().
+shared_raw_lists = None
+
+
+def compute_hash(id, name, description, completed, child_hashes):
+    '''
+    Computes the content hash of a subtree from the fields of its top list and the hashes of its sublists.
+
+    Args:
+        id (str): The ID of the list.
+        name (str): The name of the list.
+        description (str): The description of the list.
+        completed (bool): Whether the list is completed.
+        child_hashes (list): The hashes of the sublists, in order.
+
+    Returns:
+        bytes: The hash of the subtree.
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    for field in (id or '', name or '', description or ''):
+        encoded = field.encode('utf-8')
+        digest.update(len(encoded).to_bytes(4, 'big'))
+        digest.update(encoded)
+    digest.update(b'\x01' if completed else b'\x00')
+    for child_hash in child_hashes:
+        digest.update(child_hash)
+    return digest.digest()
+
+
+def share_raw_lists(raw_lists: list):
+    '''
+    Initializes a forked worker with the raw lists of its build. Forked workers inherit their
+    arguments instead of unpickling them, so the lists are not copied.
+
+    Args:
+        raw_lists (list): The raw top level lists.
+    '''
+    global shared_raw_lists
+    shared_raw_lists = raw_lists
+
+
+def split_chunks(raw_lists: list, workers: int):
+    '''
+    Splits the top level lists into ranges of consecutive lists, a few per worker so that
+    large subtrees are balanced by the pool.
+
+    Args:
+        raw_lists (list): The raw top level lists.
+        workers (int): The number of worker processes.
+
+    Returns:
+        list: The (start, end) ranges of the chunks.
+    '''
+    count = min(len(raw_lists), workers * 4)
+    if count == 0:
+        return []
+    size, remainder = divmod(len(raw_lists), count)
+    chunks = []
+    start = 0
+    for index in range(count):
+        end = start + size + (1 if index < remainder else 0)
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def convert_chunk(task):
+    '''
+    Converts a chunk of top level lists into the compact form.
+
+    Args:
+        task (tuple): The (start, end, offset, raw_lists, date_joined, skip_completed, max_depth) of the chunk.
+                      raw_lists is None when the worker was initialized by share_raw_lists(). offset is the
+                      position of raw_lists[0] among all top level lists.
+
+    Returns:
+        dict: The compact chunk, with the following keys:
+              ids (list): The list IDs.
+              parents (array): The index of the parent of each list in the chunk, -1 for the root.
+              levels (array): The level of each list.
+              strings (list): The string table.
+              names (array): The index of the name of each list in the string table.
+              descriptions (array): The index of the description of each list in the string table.
+              times (array): The creation, last modified and completed times of each list.
+              hashes (bytes): The 16 byte content hashes of the lists, concatenated.
+              stubs (list): The (path, level) of each pruned list, where path holds the positions leading to it
+                            from the top level.
+
+        The lists and stubs are in the order WorkFlowyProject.__parse_tree() registers them, sublists before their parent.
+    '''
+    start, end, offset, raw_lists, date_joined, skip_completed, max_depth = task
+    if raw_lists is None:
+        raw_lists = shared_raw_lists
+
+    chunk = {
+        'ids': [],
+        'parents': array('l'),
+        'levels': array('l'),
+        'strings': [],
+        'names': array('l'),
+        'descriptions': array('l'),
+        'times': array('q'),
+        'hashes': bytearray(),
+        'stubs': []
+    }
+    string_indexes = {}
+
+    def add_string(value):
+        if value not in string_indexes:
+            string_indexes[value] = len(chunk['strings'])
+            chunk['strings'].append(value)
+        return string_indexes[value]
+
+    def is_pruned(raw_list, level):
+        if max_depth is not None and level > max_depth:
+            return True
+        return skip_completed and raw_list.get('cp') is not None
+
+    def convert(raw_list, path, level):
+        # Mirrors WorkFlowyProject.__parse_tree(), returns the index and hash of the list
+        id = raw_list['id'] if 'id' in raw_list else ''
+        name = raw_list['nm'] if 'nm' in raw_list else ''
+        description = raw_list['no'] if 'no' in raw_list else ''
+        raw_sublists = raw_list['ch'] if 'ch' in raw_list else []
+        creation_time = date_joined + raw_list['ct'] if raw_list['ct'] is not None else 0
+        last_modified_time = date_joined + raw_list['lm'] if raw_list['lm'] is not None else 0
+        if 'cp' in raw_list.keys() and raw_list['cp'] is not None:
+            completed_time = date_joined + raw_list['cp']
+        else:
+            completed_time = 0
+
+        child_indexes = []
+        child_hashes = []
+        for position, raw_sublist in enumerate(raw_sublists or []):
+            if is_pruned(raw_sublist, level + 1):
+                chunk['stubs'].append((path + (position,), level + 1))
+                continue
+            child_index, child_hash = convert(raw_sublist, path + (position,), level + 1)
+            child_indexes.append(child_index)
+            child_hashes.append(child_hash)
+
+        index = len(chunk['ids'])
+        chunk['ids'].append(id)
+        chunk['parents'].append(-1)
+        chunk['levels'].append(level)
+        chunk['names'].append(add_string(name if isinstance(name, str) else ''))
+        chunk['descriptions'].append(add_string(description if isinstance(description, str) else ''))
+        chunk['times'].extend((creation_time, last_modified_time, completed_time))
+        digest = compute_hash(id, name, description, completed_time != 0, child_hashes)
+        chunk['hashes'] += digest
+
+        for child_index in child_indexes:
+            chunk['parents'][child_index] = index
+        return index, digest
+
+    for position in range(start, end):
+        raw_list = raw_lists[position]
+        if is_pruned(raw_list, 1):
+            chunk['stubs'].append(((offset + position,), 1))
+        else:
+            convert(raw_list, (offset + position,), 1)
+
+    chunk['hashes'] = bytes(chunk['hashes'])
+    return chunk
+
+
+def convert_parallel(raw_lists: list, workers: int, date_joined: int, skip_completed: bool = False, max_depth: int = None):
+    '''
+    Converts the top level lists into compact chunks using a process pool.
+
+    The top level lists are split into chunks of consecutive lists, and each chunk is converted by a worker
+    process into flat arrays and a string table, which are cheap to send back.
+
+    Workers are only forked while the calling thread is the only thread of the process, and then read the raw
+    lists inherited from it. A child forked while other threads run (a watcher, a daemon, a replica) would
+    inherit the locks those threads hold, in whatever state they are, and could deadlock. Otherwise the workers
+    are started by a fork server, or spawned where there is none, and each chunk is pickled and sent to its worker.
+
+    Args:
+        raw_lists (list): The raw top level lists.
+        workers (int): The number of worker processes.
+        date_joined (int): The timestamp the list times are relative to.
+        skip_completed (bool, optional): If True, completed lists are pruned. Defaults to False.
+        max_depth (int, optional): The deepest level to convert. Defaults to None (no limit).
+
+    Returns:
+        list: The compact chunks, in order. See convert_chunk().
+    '''
+    methods = multiprocessing.get_all_start_methods()
+    fork = 'fork' in methods and threading.active_count() == 1
+    tasks = []
+    for start, end in split_chunks(raw_lists, workers):
+        if fork:
+            tasks.append((start, end, 0, None, date_joined, skip_completed, max_depth))
+        else:
+            tasks.append((0, end - start, start, raw_lists[start:end], date_joined, skip_completed, max_depth))
+
+    # Each pool hands its own lists to its workers, so builds running in other threads cannot swap them
+    context = multiprocessing.get_context('fork' if fork else 'forkserver' if 'forkserver' in methods else 'spawn')
+    options = {'initializer': share_raw_lists, 'initargs': (raw_lists,)} if fork else {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, **options) as executor:
+        return list(executor.map(convert_chunk, tasks))
@@ -2,6 +2,8 @@ from workflowy_account import WorkFlowyAccount
 from workflowy_transport import WorkFlowyTransport
 from workflowy_exception import WorkFlowyException
 from workflowy_project import WorkFlowyProject
+from workflowy_watcher import WorkFlowyWatcher
+from workflowy_session import WorkFlowySessionManager
 import re
 
 class WorkFlowyClient:
@@ -12,19 +14,24 @@ class WorkFlowyClient:
         session_id (str): The session ID for the authenticated user.
         project (WorkFlowyProject): The project associated with the authenticated user.
         account (WorkFlowyAccount): The account associated with the authenticated user.
+        session_manager (WorkFlowySessionManager): The manager providing and renewing the session ID, or None.
     """
 
-    def __init__(self, session_id=None):
+    def __init__(self, session_id=None, session_manager=None):
         self.session_id = None
         self.project = None
         self.account = None
+        self.session_manager = session_manager
+
+        if session_id is None and session_manager is not None:
+            session_id = session_manager.get_session_id()
 
         if session_id is not None:
             if not re.match('^[a-z0-9]{32}$', session_id):
                 raise WorkFlowyException('Invalid session Id')
             self.session_id = session_id
-            self.project = WorkFlowyProject(self.session_id)
-            self.account = WorkFlowyAccount(self.session_id)
+            self.project = WorkFlowyProject(self.session_id, session_manager=session_manager)
+            self.account = WorkFlowyAccount(self.session_id, session_manager=session_manager)
 
 
     def login(username: str, password: str):
@@ -51,6 +58,25 @@ class WorkFlowyClient:
             raise WorkFlowyException("Login failed")
 
 
+    def from_cache(username: str, password: str = None, cache_dir: str = None):
+        """
+        Creates a client with the session of the given user cached on disk, logging in only if there is
+        no valid cached session. The session is renewed automatically when WorkFlowy rejects it.
+
+        Args:
+            username (str): The username for the WorkFlowy account.
+            password (str, optional): The password for the WorkFlowy account, needed if a login is required. Defaults to None.
+            cache_dir (str, optional): The directory holding the cached sessions. Defaults to workflowy in the user cache directory.
+
+        Returns:
+            WorkFlowyClient: The client.
+
+        Raises:
+            WorkFlowyException: If a login is needed and fails.
+        """
+        return WorkFlowyClient(session_manager=WorkFlowySessionManager(username, password, cache_dir=cache_dir))
+
+
     def get_main_list(self):
         """
         Retrieves and returns the main list associated with the authenticated user.
@@ -71,6 +97,24 @@ class WorkFlowyClient:
         return self.account.get_account()
 
 
+    def watch(self, min_interval: float = 1.0, max_interval: float = 30.0, coalesce_window: float = 2.0):
+        """
+        Creates a watcher for changes made to the main list by other clients.
+        The main list is built first if it has not been retrieved yet.
+
+        Args:
+            min_interval (float, optional): The shortest time between polls, in seconds. Defaults to 1.0.
+            max_interval (float, optional): The longest time between polls, in seconds. Defaults to 30.0.
+            coalesce_window (float, optional): The longest time changes are buffered, in seconds. Defaults to 2.0.
+
+        Returns:
+            WorkFlowyWatcher: The watcher. Register callbacks, then call start().
+        """
+        if not hasattr(self.project, 'all_lists'):
+            self.project.build_list()
+        return WorkFlowyWatcher(self.project, min_interval=min_interval, max_interval=max_interval, coalesce_window=coalesce_window)
+
+
     # TODO: Implement exporting OPML of a list
     '''
     Returns an OPML string of the given list. If no list is given, returns an OPML string of the main list.
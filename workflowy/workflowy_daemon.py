@@ -0,0 +1,838 @@
+from workflowy_exception import WorkFlowyException
+from workflowy_watcher import WorkFlowyWatcher
+from workflowy_list import WorkFlowyList
+from contextlib import contextmanager
+import argparse, json, os, socket, socketserver, threading
+
+class WorkFlowyDaemon:
+    """
+    Serves a warm WorkFlowy tree to local processes over a Unix socket.
+
+    The daemon keeps the tree of a project loaded and in sync with a watcher, so that scripts can read and change
+    it without downloading and building the whole tree on every run. Clients send one JSON request per line and
+    get one JSON response per line, on a connection that can be reused for many requests:
+
+        {"method": "get_list", "params": {"id": "..."}}
+        {"result": {...}} or {"error": "..."}
+
+    Lists are returned as dicts with the fields of WorkFlowyList. The root has the ID ''.
+
+    Methods:
+        ping(): Returns the number of loaded lists.
+        get_list(id): Returns a list.
+        get_parent(id): Returns the parent of a list, or None for the root.
+        get_sublists(id): Returns the sublists of a list.
+        get_tree(id, max_depth): Returns a list with its sublists nested under "sublists", down to max_depth levels below it.
+        search(id, expression, get_all, exact_match): Searches the subtree of a list like WorkFlowyList.search_sublist().
+        get_hash(id): Returns the content hash of the subtree of a list.
+        apply(mutations): Applies mutations in order, sending them in a single request. Returns the IDs of the created lists.
+        sync(): Polls for remote changes immediately.
+
+    The mutations are dicts with a "type" key:
+        {"type": "create", "parent": id, "name": str, "description": str, "priority": int}
+        {"type": "edit", "id": id, "name": str, "description": str}
+        {"type": "complete", "id": id} and {"type": "uncomplete", "id": id}
+        {"type": "move", "id": id, "parent": id, "priority": int}
+        {"type": "delete", "id": id}
+
+    Attributes:
+        project (WorkFlowyProject): The project being served. Its main list must have been built.
+        socket_path (str): The path of the Unix socket.
+        watcher (WorkFlowyWatcher): The watcher keeping the tree in sync, or None.
+        server (socketserver.ThreadingUnixStreamServer): The server, once started.
+    """
+
+    METHODS = ('ping', 'get_list', 'get_parent', 'get_sublists', 'get_tree', 'search', 'get_hash', 'apply', 'sync')
+
+    def __init__(self, project, socket_path: str, min_interval: float = 1.0, max_interval: float = 30.0, watch: bool = True):
+        """
+        Initializes a WorkFlowyDaemon object.
+
+        Args:
+            project (WorkFlowyProject): The project to serve. Its main list must have been built.
+            socket_path (str): The path of the Unix socket.
+            min_interval (float, optional): The shortest time between polls for remote changes, in seconds. Defaults to 1.0.
+            max_interval (float, optional): The longest time between polls for remote changes, in seconds. Defaults to 30.0.
+            watch (bool, optional): Whether the tree is kept in sync by polling. Defaults to True.
+
+        Raises:
+            WorkFlowyException: If the main list of the project has not been built.
+        """
+        if not hasattr(project, 'all_lists'):
+            raise WorkFlowyException('The main list must be built before serving it')
+
+        self.project = project
+        self.socket_path = socket_path
+        self.watcher = WorkFlowyWatcher(project, min_interval=min_interval, max_interval=max_interval) if watch else None
+        self.server = None
+        self.thread = None
+
+
+    def start(self):
+        """
+        Start serving and watching on background threads.
+
+        Raises:
+            WorkFlowyException: If the socket path is used by a running server.
+        """
+        self.__bind()
+        if self.watcher is not None:
+            self.watcher.start()
+        self.thread = threading.Thread(target=self.server.serve_forever, name='WorkFlowyDaemon', daemon=True)
+        self.thread.start()
+
+
+    def serve_forever(self):
+        """
+        Serve and watch until stop() is called from another thread or the process is interrupted.
+
+        Raises:
+            WorkFlowyException: If the socket path is used by a running server.
+        """
+        self.__bind()
+        if self.watcher is not None:
+            self.watcher.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.__close()
+
+
+    def stop(self):
+        """
+        Stop serving and watching, and remove the socket.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.__close()
+
+
+    def handle(self, request: dict):
+        """
+        Run a request.
+
+        Args:
+            request (dict): The request, with a "method" key and an optional "params" dict.
+
+        Returns:
+            dict: The response, with a "result" or an "error" key.
+        """
+        if not isinstance(request, dict) or request.get('method') not in self.METHODS:
+            return {'error': 'Invalid request'}
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return {'error': 'Invalid request'}
+
+        try:
+            return {'result': getattr(self, '_WorkFlowyDaemon__' + request['method'])(**params)}
+        except TypeError as e:
+            return {'error': f"Invalid parameters: {e}"}
+        except WorkFlowyException as e:
+            return {'error': e.message}
+        except Exception as e:
+            return {'error': f"{e.__class__.__name__}: {e}"}
+
+
+    def __ping(self):
+        """
+        Get the number of loaded lists.
+        """
+        with self.project.lock.read():
+            return {'lists': len(self.project.all_lists)}
+
+
+    def __get_list(self, id=''):
+        """
+        Get a list.
+        """
+        sublist = self.__resolve(id)
+        with self.project.lock.read():
+            return self.__node(sublist)
+
+
+    def __get_parent(self, id=''):
+        """
+        Get the parent of a list, or None for the root.
+        """
+        sublist = self.__resolve(id)
+        if sublist.level == 0:
+            return None
+        with self.project.lock.read():
+            return self.__node(self.project.all_lists[self.project.parent_ids.get(sublist.id)])
+
+
+    def __get_sublists(self, id=''):
+        """
+        Get the sublists of a list.
+        """
+        sublist = self.__resolve(id)
+        with self.project.lock.read():
+            return [self.__node(child) for child in sublist.sublists]
+
+
+    def __get_tree(self, id='', max_depth=None):
+        """
+        Get a list with its sublists nested under "sublists", down to max_depth levels below it.
+        """
+        sublist = self.__resolve(id)
+        with self.project.lock.read():
+            def tree(current, depth):
+                node = self.__node(current)
+                if max_depth is None or depth < max_depth:
+                    node['sublists'] = [tree(child, depth + 1) for child in current.sublists]
+                return node
+            return tree(sublist, 0)
+
+
+    def __search(self, expression, id='', get_all=False, exact_match=False):
+        """
+        Search the subtree of a list like WorkFlowyList.search_sublist().
+        """
+        matches = self.__resolve(id).search_sublist(expression, get_all, exact_match)
+        with self.project.lock.read():
+            return [self.__node(match) for match in matches or []]
+
+
+    def __get_hash(self, id=''):
+        """
+        Get the content hash of the subtree of a list.
+        """
+        return self.__resolve(id).get_hash()
+
+
+    def __sync(self):
+        """
+        Poll for remote changes immediately.
+        """
+        if self.watcher is not None:
+            # The changes are queued for the watcher, which dispatches them to its callbacks
+            self.watcher.dispatch(self.watcher.poll())
+        else:
+            self.project.poll_changes()
+        return self.__ping()
+
+
+    def __apply(self, mutations):
+        """
+        Apply mutations in order, sending them in a single request when the batch limits allow.
+        """
+        if not isinstance(mutations, list):
+            raise WorkFlowyException('Mutations must be a list')
+
+        project = self.project
+        with project.transport.lock:
+            # The transport lock keeps the tree from changing between the checks and the update
+            operations, created = self.__to_operations(mutations)
+            if operations:
+                project.push_operations(operations)
+                project.apply_operations(operations)
+        return {'created': created}
+
+
+    def __to_operations(self, mutations: list):
+        """
+        Check mutations against the tree as it will be after the previous ones, and convert them into operations.
+
+        Args:
+            mutations (list): The mutations.
+
+        Returns:
+            tuple: The operations, and the IDs of the created lists in order.
+
+        Raises:
+            WorkFlowyException: If a mutation is invalid or refers to a list that is not in the tree.
+        """
+        project = self.project
+        parents = {}
+        deleted = set()
+        operations = []
+        created = []
+
+        def parent_of(id):
+            return parents[id] if id in parents else project.parent_ids.get(id)
+
+        def check(id, allow_root=False):
+            # Returns the key of the list, None for the root
+            if id in (None, ''):
+                if not allow_root:
+                    raise WorkFlowyException('Changing the root is not currently supported')
+                return None
+            if not isinstance(id, str):
+                raise WorkFlowyException('List IDs must be strings')
+            if id not in parents:
+                self.__resolve(id)
+            current = id
+            while current is not None:
+                if current in deleted:
+                    raise WorkFlowyException(f"List {id} not found")
+                current = parent_of(current)
+            return id
+
+        def properties(mutation, keep_empty):
+            # Every field is checked here, since nothing can be undone once the operations are sent
+            values = {}
+            for key in ('name', 'description'):
+                value = mutation.get(key)
+                if value is None:
+                    continue
+                if not isinstance(value, str):
+                    raise WorkFlowyException('Names and descriptions must be strings')
+                if value or keep_empty:
+                    values[key] = value
+            return values
+
+        def priority(mutation):
+            value = mutation.get('priority', 0)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise WorkFlowyException('Priority must be a non-negative integer')
+            return value
+
+        for mutation in mutations:
+            action = mutation.get('type') if isinstance(mutation, dict) else None
+
+            if action == 'create':
+                parent = check(mutation.get('parent'), allow_root=True)
+                values = properties(mutation, keep_empty=False)
+                new_id = WorkFlowyList.generate_id()
+                operations.append({'type': 'create', 'data': {
+                    'projectid': new_id,
+                    'parentid': 'None' if parent is None else parent,
+                    'priority': priority(mutation),
+                }})
+                if values:
+                    operations.append({'type': 'edit', 'data': {'projectid': new_id, **values}})
+                parents[new_id] = parent
+                created.append(new_id)
+
+            elif action == 'edit':
+                id = check(mutation.get('id'))
+                values = properties(mutation, keep_empty=True)
+                if values:
+                    operations.append({'type': 'edit', 'data': {'projectid': id, **values}})
+
+            elif action in ('complete', 'uncomplete', 'delete'):
+                id = check(mutation.get('id'))
+                operations.append({'type': action, 'data': {'projectid': id}})
+                if action == 'delete':
+                    deleted.add(id)
+
+            elif action == 'move':
+                id = check(mutation.get('id'))
+                destination = check(mutation.get('parent'), allow_root=True)
+                position = priority(mutation)
+                if destination is None:
+                    raise WorkFlowyException('Moving to root is not currently supported')
+                if destination == id:
+                    raise WorkFlowyException('Destination cannot be self')
+                current = destination
+                while current is not None:
+                    if current == id:
+                        raise WorkFlowyException('Destination cannot be a child of self')
+                    current = parent_of(current)
+                operations.append({'type': 'move', 'data': {
+                    'projectid': id,
+                    'parentid': destination,
+                    'priority': position,
+                }})
+                parents[id] = destination
+
+            else:
+                raise WorkFlowyException(f"Unknown mutation {action}")
+
+        return operations, created
+
+
+    def __resolve(self, id):
+        """
+        Get a list of the tree, loading it if it was pruned.
+
+        Args:
+            id (str): The ID of the list, '' or None for the root.
+
+        Returns:
+            WorkFlowyList: The list.
+
+        Raises:
+            WorkFlowyException: If the list is not found.
+        """
+        root = self.project.all_lists[None]
+        if id in (None, ''):
+            return root
+        if not isinstance(id, str):
+            raise WorkFlowyException('List IDs must be strings')
+        return root.get_list(id)
+
+
+    def __node(self, sublist):
+        """
+        Convert a list into a dict sent to clients. Must be called while holding the tree lock.
+
+        Args:
+            sublist (WorkFlowyList): The list.
+
+        Returns:
+            dict: The fields of the list.
+        """
+        return {
+            'id': sublist.id,
+            'name': sublist.name,
+            'description': sublist.description,
+            'level': sublist.level,
+            'creation_time': sublist.creation_time,
+            'last_modified_time': sublist.last_modified_time,
+            'completed_time': sublist.completed_time,
+            'parent_id': None if sublist.level == 0 else (self.project.parent_ids.get(sublist.id) or ''),
+            'sublist_count': len(sublist.sublists)
+        }
+
+
+    def __bind(self):
+        """
+        Create the server, replacing the socket left behind by a daemon that is no longer running.
+
+        Raises:
+            WorkFlowyException: If the socket path is used by a running server.
+        """
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise WorkFlowyException(f"A daemon is already listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.socket_path)
+            finally:
+                probe.close()
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    for line in self.rfile:
+                        try:
+                            response = daemon.handle(json.loads(line))
+                        except ValueError:
+                            response = {'error': 'Invalid JSON'}
+                        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away, there is nobody to answer
+                    pass
+
+        # Only the owner can connect, the daemon acts with their session. Connections are refused until
+        # listen(), so the socket is restricted between the bind and the listen, without touching the umask
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler, bind_and_activate=False)
+        try:
+            self.server.server_bind()
+            os.chmod(self.socket_path, 0o600)
+            self.server.server_activate()
+        except BaseException:
+            self.server.server_close()
+            self.server = None
+            raise
+        self.server.daemon_threads = True
+
+
+    def __close(self):
+        """
+        Stop watching, close the server and remove the socket.
+        """
+        if self.watcher is not None and self.watcher.thread is not None:
+            self.watcher.stop()
+        if self.server is not None:
+            self.server.server_close()
+            self.server = None
+            try:
+                os.remove(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+
+class WorkFlowyDaemonClient:
+    """
+    A client for a WorkFlowyDaemon. It keeps one connection open and can be shared between threads.
+    Batches belong to the thread that opened them, changes made by other threads are sent right away.
+
+    Attributes:
+        socket_path (str): The path of the Unix socket of the daemon.
+        timeout (float): The timeout of requests, in seconds.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        """
+        Initializes a WorkFlowyDaemonClient object.
+
+        Args:
+            socket_path (str): The path of the Unix socket of the daemon.
+            timeout (float, optional): The timeout of requests, in seconds. Defaults to 30.0.
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connection = None
+        self.reader = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+
+    def request(self, method: str, **params):
+        """
+        Send a request to the daemon.
+
+        Args:
+            method (str): The method, one of WorkFlowyDaemon.METHODS.
+            **params: The parameters of the method.
+
+        Returns:
+            The result of the request.
+
+        Raises:
+            WorkFlowyException: If the daemon cannot be reached or the request fails.
+        """
+        line = json.dumps({'method': method, 'params': params}).encode('utf-8') + b'\n'
+        with self.lock:
+            try:
+                if self.connection is None:
+                    self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self.connection.settimeout(self.timeout)
+                    self.connection.connect(self.socket_path)
+                    self.reader = self.connection.makefile('rb')
+                self.connection.sendall(line)
+                response = self.reader.readline()
+                if not response:
+                    raise OSError('Connection closed by the daemon')
+            except OSError as e:
+                self.close()
+                raise WorkFlowyException(f"Error during request: {e}")
+
+        response = json.loads(response)
+        if 'error' in response:
+            raise WorkFlowyException(response['error'])
+        return response['result']
+
+
+    def close(self):
+        """
+        Close the connection to the daemon. It is opened again by the next request.
+        """
+        if self.connection is not None:
+            self.reader.close()
+            self.connection.close()
+            self.connection = None
+            self.reader = None
+
+
+    def get_main_list(self):
+        """
+        Get the root list.
+
+        Returns:
+            WorkFlowyRemoteList: The root list.
+        """
+        return self.get_list('')
+
+
+    def get_list(self, id: str):
+        """
+        Get the list with the given ID.
+
+        Args:
+            id (str): The ID of the list.
+
+        Returns:
+            WorkFlowyRemoteList: The list.
+
+        Raises:
+            WorkFlowyException: If the list is not found.
+        """
+        return WorkFlowyRemoteList(self, self.request('get_list', id=id))
+
+
+    def get_tree(self, id: str = '', max_depth: int = None):
+        """
+        Get a list and its sublists in a single request.
+
+        Args:
+            id (str, optional): The ID of the list. Defaults to '' (the root).
+            max_depth (int, optional): The number of levels to get below the list. Defaults to None (no limit).
+
+        Returns:
+            WorkFlowyRemoteList: The list. get_sublists() on the lists of the tree does not make any request.
+        """
+        return WorkFlowyRemoteList(self, self.request('get_tree', id=id, max_depth=max_depth))
+
+
+    def sync(self):
+        """
+        Make the daemon poll for remote changes immediately.
+        """
+        self.request('sync')
+
+
+    def mutate(self, mutation: dict):
+        """
+        Apply a mutation, or queue it if a batch is open.
+
+        Args:
+            mutation (dict): The mutation. See WorkFlowyDaemon.
+
+        Returns:
+            list: The IDs of the created lists, empty if the mutation was queued.
+        """
+        mutations = getattr(self.local, 'mutations', None)
+        if mutations is not None:
+            mutations.append(mutation)
+            return []
+        return self.request('apply', mutations=[mutation])['created']
+
+
+    @contextmanager
+    def batch(self):
+        """
+        Queue the changes made by this thread in a with block and apply them in a single request when it ends.
+        Nothing is applied if the block raises.
+
+        Yields:
+            list: The queued mutations.
+        """
+        if getattr(self.local, 'mutations', None) is not None:
+            raise WorkFlowyException('A batch is already open')
+        mutations = self.local.mutations = []
+        try:
+            yield mutations
+        finally:
+            self.local.mutations = None
+        if mutations:
+            self.request('apply', mutations=mutations)
+
+
+class WorkFlowyRemoteList:
+    """
+    A list served by a WorkFlowyDaemon, with the same methods as WorkFlowyList.
+
+    The fields are those of the list when it was retrieved. Methods returning other lists make a request.
+    Changes made inside WorkFlowyDaemonClient.batch() are sent when the batch ends.
+
+    Attributes:
+        client (WorkFlowyDaemonClient): The client the list was retrieved with.
+        id (str): The unique identifier of the list, '' for the root.
+        name (str): The name of the list.
+        description (str): The description of the list.
+        level (int): The level of the list in the hierarchy.
+        creation_time (int): The timestamp of when the list was created.
+        last_modified_time (int): The timestamp of when the list was last modified.
+        completed_time (int): The timestamp of when the list was completed.
+        parent_id (str): The ID of the parent list, '' for the root and None for the root itself.
+        sublist_count (int): The number of sublists.
+    """
+
+    def __init__(self, client, data: dict):
+        """
+        Initializes a WorkFlowyRemoteList object.
+
+        Args:
+            client (WorkFlowyDaemonClient): The client the list was retrieved with.
+            data (dict): The fields of the list sent by the daemon.
+        """
+        self.client = client
+        self.id = data['id']
+        self.name = data['name']
+        self.description = data['description']
+        self.level = data['level']
+        self.creation_time = data['creation_time']
+        self.last_modified_time = data['last_modified_time']
+        self.completed_time = data['completed_time']
+        self.parent_id = data['parent_id']
+        self.sublist_count = data['sublist_count']
+        self.sublists = [WorkFlowyRemoteList(client, child) for child in data['sublists']] if 'sublists' in data else None
+
+
+    def get_id(self):
+        """
+        Get the unique identifier of the list.
+        """
+        return self.id
+
+
+    def get_name(self):
+        """
+        Get the name of the list.
+        """
+        return self.name
+
+
+    def get_description(self):
+        """
+        Get the description of the list.
+        """
+        return self.description
+
+
+    def get_creation_time(self):
+        """
+        Get the timestamp of when the list was created.
+        """
+        return self.creation_time
+
+
+    def get_last_modified_time(self):
+        """
+        Get the timestamp of when the list was last modified.
+        """
+        return self.last_modified_time
+
+
+    def get_completed_time(self):
+        """
+        Get the timestamp of when the list was completed.
+        """
+        return self.completed_time
+
+
+    def is_completed(self):
+        """
+        Check if the list is completed.
+        """
+        return self.completed_time != 0
+
+
+    def get_level(self):
+        """
+        Get the level of the list in the hierarchy.
+        """
+        return self.level
+
+
+    def get_parent(self):
+        """
+        Get the parent list of the list.
+
+        Returns:
+            WorkFlowyRemoteList: The parent list, or False for the root.
+        """
+        data = self.client.request('get_parent', id=self.id)
+        return WorkFlowyRemoteList(self.client, data) if data else False
+
+
+    def get_sublists(self):
+        """
+        Get the sublists of the list. Lists retrieved with get_tree() already hold them.
+
+        Returns:
+            list: The WorkFlowyRemoteList objects of the sublists.
+        """
+        if self.sublists is not None:
+            return list(self.sublists)
+        return [WorkFlowyRemoteList(self.client, data) for data in self.client.request('get_sublists', id=self.id)]
+
+
+    def get_list(self, id: str):
+        """
+        Get the list with the given ID.
+        """
+        return self.client.get_list(id)
+
+
+    def get_hash(self):
+        """
+        Get the content hash of the subtree under the list.
+        """
+        return self.client.request('get_hash', id=self.id)
+
+
+    def search_sublist(self, expression: str, get_all: bool = False, exact_match: bool = False):
+        """
+        Search for a sublist by name using regular expression, like WorkFlowyList.search_sublist().
+
+        Returns:
+            list: The matching WorkFlowyRemoteList objects, or False if there are none.
+        """
+        matches = self.client.request('search', id=self.id, expression=expression, get_all=get_all, exact_match=exact_match)
+        return [WorkFlowyRemoteList(self.client, data) for data in matches] or False
+
+
+    def set_name(self, name: str):
+        """
+        Set the name of the list.
+        """
+        self.client.mutate({'type': 'edit', 'id': self.id, 'name': name})
+        self.name = name
+
+
+    def set_description(self, description: str):
+        """
+        Set the description of the list.
+        """
+        self.client.mutate({'type': 'edit', 'id': self.id, 'description': description})
+        self.description = description
+
+
+    def set_complete(self, complete: bool):
+        """
+        Set the completion status of the list.
+        """
+        self.client.mutate({'type': 'complete' if complete else 'uncomplete', 'id': self.id})
+
+
+    def move(self, destination, priority: int = 0):
+        """
+        Move the list to a new destination.
+        """
+        if not isinstance(destination, WorkFlowyRemoteList):
+            raise WorkFlowyException('Destination must be a WorkFlowyRemoteList object')
+        self.client.mutate({'type': 'move', 'id': self.id, 'parent': destination.id, 'priority': priority})
+        self.parent_id = destination.id
+
+
+    def delete(self):
+        """
+        Delete the list.
+        """
+        self.client.mutate({'type': 'delete', 'id': self.id})
+
+
+    def create_sublist(self, name: str = None, description: str = None, priority: int = 0):
+        """
+        Create a new sublist within the list.
+
+        Args:
+            name (str, optional): The name of the new sublist. Defaults to None.
+            description (str, optional): The description of the new sublist. Defaults to None.
+            priority (int, optional): The priority of the new sublist. Defaults to 0.
+
+        Returns:
+            str: The ID of the new sublist, or None if it was queued in a batch.
+        """
+        created = self.client.mutate({'type': 'create', 'parent': self.id, 'name': name, 'description': description, 'priority': priority})
+        return created[0] if created else None
+
+
+def main():
+    """
+    Run a daemon for the account given on the command line. The password is read from the
+    WORKFLOWY_PASSWORD environment variable when a login is needed.
+    """
+    from workflowy_session import WorkFlowySessionManager
+    from workflowy_project import WorkFlowyProject
+
+    parser = argparse.ArgumentParser(description='Serve a WorkFlowy tree over a Unix socket.')
+    parser.add_argument('--username', required=True, help='The username of the account.')
+    parser.add_argument('--socket', required=True, help='The path of the Unix socket.')
+    parser.add_argument('--min-interval', type=float, default=1.0, help='The shortest time between polls, in seconds.')
+    parser.add_argument('--max-interval', type=float, default=30.0, help='The longest time between polls, in seconds.')
+    args = parser.parse_args()
+
+    manager = WorkFlowySessionManager(args.username, os.environ.get('WORKFLOWY_PASSWORD'))
+    project = WorkFlowyProject(manager.get_session_id(), session_manager=manager)
+    project.build_list()
+    daemon = WorkFlowyDaemon(project, args.socket, min_interval=args.min_interval, max_interval=args.max_interval)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -15,3 +15,15 @@ class WorkFlowyException(Exception):
 
     def __str__(self):
         return f"WorkFlowyException: {self.message}"
+
+
+class WorkFlowyAuthException(WorkFlowyException):
+    """Raised when WorkFlowy rejects the session ID of a request.
+
+    Args:
+        message (str): The error message.
+
+    """
+
+    def __str__(self):
+        return f"WorkFlowyAuthException: {self.message}"
@@ -2,6 +2,7 @@ from workflowy_transport import WorkFlowyTransport
 from workflowy_exception import WorkFlowyException
 import re
 import random
+import time
 
 class WorkFlowyList:
     """
@@ -18,8 +19,13 @@ class WorkFlowyList:
     - sublists: The sublists contained within the list (list of WorkFlowyList objects).
     - main_list: The main list to which the list belongs (WorkFlowyProject object).
     - transport: The transport object used for making API requests (WorkFlowyTransport object).
+    - text_store: The store holding the description of the list (WorkFlowyTextStore object).
+    - description_handle: The handle of the description in the text store (integer, None if empty).
+    - detached_description: The description of a list removed from the tree, kept once its text is released (string, None otherwise).
     """
 
+    detached_description = None
+
     def __init__(self, id, name, description, level, creation_time, last_modified_time, completed_time, sublists, main_list, transport):
         """
         Initializes a WorkFlowyList object.
@@ -37,8 +43,6 @@ class WorkFlowyList:
         - transport: The transport object used for making API requests (WorkFlowyTransport object).
         """
         self.id = id if isinstance(id, str) else ''
-        self.name = name if isinstance(name, str) else ''
-        self.description = description if isinstance(description, str) else ''
         self.level = level if isinstance(level, int) else -1
         self.creation_time = creation_time if isinstance(creation_time, int) else 0
         self.last_modified_time = last_modified_time if isinstance(last_modified_time, int) else 0
@@ -58,6 +62,12 @@ class WorkFlowyList:
             self.main_list = main_list
         else:
             raise WorkFlowyException('List must be a WorkFlowyProject object')
+
+        # Names are shared and descriptions are kept encoded in the text store of the project
+        self.text_store = main_list.text_store
+        self.name = self.text_store.intern(name if isinstance(name, str) else '')
+        self.description_handle = None
+        self.description = description if isinstance(description, str) else ''
         
         # Check transport
         if isinstance(transport, WorkFlowyTransport):
@@ -66,6 +76,36 @@ class WorkFlowyList:
             raise WorkFlowyException('Transport must be a WorkFlowyTransport object')
         
 
+    @property
+    def description(self):
+        """
+        The description of the list, decoded from the text store when it is read.
+        """
+        if self.detached_description is not None:
+            return self.detached_description
+        return self.text_store.get(self.description_handle)
+
+
+    @description.setter
+    def description(self, description):
+        previous = self.description_handle
+        self.description_handle = self.text_store.add(description)
+        self.text_store.release(previous)
+        if self.detached_description is not None:
+            self.detached_description = None
+
+
+    def release_text(self):
+        """
+        Give the name and description back to the text store once the list has left the tree, so that their space
+        can be reused. The list keeps its name and a plain copy of its description, so both can still be read.
+        """
+        self.detached_description = self.description
+        self.text_store.release(self.name)
+        self.text_store.release(self.description_handle)
+        self.description_handle = None
+
+
     def search_sublist(self, expression: str, get_all: bool = False, exact_match: bool = False) -> list:
         """
         Search for a sublist by name using regular expression.
@@ -87,20 +127,21 @@ class WorkFlowyList:
         if not isinstance(expression, str):
             raise WorkFlowyException('Search expression must be a string')
         
-        matches = []
-        if (exact_match and expression == self.name) or (not exact_match and re.search(expression, self.name, re.IGNORECASE)):
-            matches.append(self)
-            if not get_all:
-                return matches
-            
-        for sublist in self.sublists:
-            match = sublist.search_sublist(expression, get_all, exact_match)
-            if match:
-                matches.extend(match)
-                if not get_all and len(matches) > 0:
+        with self.main_list.lock.read():
+            matches = []
+            if (exact_match and expression == self.name) or (not exact_match and re.search(expression, self.name, re.IGNORECASE)):
+                matches.append(self)
+                if not get_all:
                     return matches
             
-        return matches if matches else False
+            for sublist in self.sublists:
+                match = sublist.search_sublist(expression, get_all, exact_match)
+                if match:
+                    matches.extend(match)
+                    if not get_all and len(matches) > 0:
+                        return matches
+            
+            return matches if matches else False
 
 
     def get_id(self):
@@ -168,7 +209,7 @@ class WorkFlowyList:
         Get the parent list of the current list.
 
         Returns:
-            WorkFlowyList: The parent list of the current list.
+            WorkFlowyList or None: The parent list of the current list, or None if it is no longer in the tree.
         """
         return self.main_list.get_list_parent(self.id)
 
@@ -203,19 +244,33 @@ class WorkFlowyList:
         pass
 
 
+    def get_hash(self):
+        """
+        Get the content hash of the subtree under the list. It changes whenever a name, description,
+        completion or order in the subtree changes.
+
+        Returns:
+            str: The hexadecimal hash of the subtree.
+        """
+        return self.main_list.get_hash(self)
+
+
     def get_sublists(self):
         """
         Get the sublists contained within the list.
 
         Returns:
-            list: A list of WorkFlowyList objects representing the sublists.
+            list: A list of WorkFlowyList objects representing the sublists. It is a copy, so it is safe to
+                  iterate while other threads change the tree.
         """
-        return self.sublists
+        with self.main_list.lock.read():
+            return list(self.sublists)
     
 
     def get_list(self, id: str):
         """
-        Get the list with the given ID.
+        Get the list with the given ID. A list left out by build_list() is loaded together with the
+        pruned region it belongs to.
 
         Args:
             id (str): The ID of the list to retrieve.
@@ -226,10 +281,46 @@ class WorkFlowyList:
         Raises:
             WorkFlowyException: If the list with the given ID is not found.
         """
-        if id in self.main_list.all_lists:
-            return self.main_list.all_lists[id]
-        else:
-            raise WorkFlowyException(f"List {id} not found")
+        with self.main_list.lock.read():
+            if id in self.main_list.all_lists:
+                return self.main_list.all_lists[id]
+            pruned_root = self.main_list.get_pruned_root(id)
+
+        if pruned_root is not None: # Pruned lists are loaded on demand, with the whole pruned region around them
+            try:
+                self.main_list.expand_list(pruned_root)
+            except WorkFlowyException:
+                pass # Another thread may have expanded or deleted the region first
+            with self.main_list.lock.read():
+                if id in self.main_list.all_lists:
+                    return self.main_list.all_lists[id]
+        raise WorkFlowyException(f"List {id} not found")
+
+
+    def has_pruned_sublists(self):
+        """
+        Check if some sublists were left out when the tree was built.
+
+        Returns:
+            bool: True if the list has pruned sublists, False otherwise.
+        """
+        return len(self.main_list.get_pruned_ids(self)) > 0
+
+
+    def expand(self, skip_completed: bool = False, max_depth: int = None):
+        """
+        Load the pruned sublists of the list.
+
+        Args:
+            skip_completed (bool, optional): If True, completed sublists stay pruned. Defaults to False.
+            max_depth (int, optional): The deepest level to load. Defaults to None (no limit).
+
+        Returns:
+            list: A list of WorkFlowyList objects representing the sublists.
+        """
+        for id in self.main_list.get_pruned_ids(self):
+            self.main_list.expand_list(id, skip_completed, max_depth)
+        return self.get_sublists()
         
 
     # Setters
@@ -241,11 +332,16 @@ class WorkFlowyList:
         Args:
             name (str): The new name of the list.
         """
-        self.name = name
-        self.transport.listRequest('edit', {
-            'projectid': self.id,
-            'name': name
-        })
+        with self.transport.lock:
+            self.main_list.push_operations([{'type': 'edit', 'data': {
+                'projectid': self.id,
+                'name': name
+            }}])
+            with self.main_list.lock.write():
+                previous = self.name
+                self.name = self.text_store.intern(name)
+                self.text_store.release(previous)
+                self.main_list.update_hashes(self)
         
     
     def set_description(self, description: str):
@@ -255,11 +351,14 @@ class WorkFlowyList:
         Args:
             description (str): The new description of the list.
         """
-        self.description = description
-        self.transport.listRequest('edit', {
-            'projectid': self.id,
-            'description': description
-        })
+        with self.transport.lock:
+            self.main_list.push_operations([{'type': 'edit', 'data': {
+                'projectid': self.id,
+                'description': description
+            }}])
+            with self.main_list.lock.write():
+                self.description = description
+                self.main_list.update_hashes(self)
         
 
     def set_complete(self, complete: bool):
@@ -269,15 +368,47 @@ class WorkFlowyList:
         Args:
             complete (bool): True to mark the list as completed, False to mark it as incomplete.
         """
-        if complete:
-            self.transport.listRequest('complete', {
-                'projectid': self.id
-            })
-        else:
-            self.transport.listRequest('uncomplete', {
-                'projectid': self.id
-            })
-            self.completed_time = 0
+        with self.transport.lock:
+            if complete:
+                self.main_list.push_operations([{'type': 'complete', 'data': {
+                    'projectid': self.id
+                }}])
+                with self.main_list.lock.write():
+                    self.completed_time = int(time.time())
+                    self.main_list.update_hashes(self)
+            else:
+                self.main_list.push_operations([{'type': 'uncomplete', 'data': {
+                    'projectid': self.id
+                }}])
+                with self.main_list.lock.write():
+                    self.completed_time = 0
+                    self.main_list.update_hashes(self)
+
+
+    def set_subtree_complete(self, complete: bool = True):
+        """
+        Set the completion status of the list and all its sublists in a single request.
+
+        Args:
+            complete (bool, optional): True to mark the lists as completed, False to mark them as incomplete. Defaults to True.
+
+        Returns:
+            list: The WorkFlowyList objects whose completion status changed.
+        """
+        return self.main_list.set_complete(self.__subtree_ids(), complete)
+
+
+    def rename_subtree(self, function):
+        """
+        Rename the list and all its sublists in a single request.
+
+        Args:
+            function (callable): The function called with each WorkFlowyList, returning its new name.
+
+        Returns:
+            list: The WorkFlowyList objects whose name changed.
+        """
+        return self.main_list.rename_lists(self.__subtree_ids(), function)
 
 
     def move(self, destination, priority: int = 0):
@@ -302,35 +433,29 @@ class WorkFlowyList:
         if destination.level == 0:
             raise WorkFlowyException('Moving to root is not currently supported')
         
-        source_parent = self.get_parent()
-        # Check that the destination is not a child of self. Break if the destination is the root.
-        parent = destination.get_parent()
-        while self.level < parent.level:
-            if parent.id == self.id:
+        with self.transport.lock:
+            # Check that both lists are still in the tree, another thread may have deleted them
+            for sublist in (self, destination):
+                if self.main_list.all_lists.get(sublist.id) is not sublist:
+                    raise WorkFlowyException(f"List {sublist.id} not found")
+
+            # Check that the destination is not a child of self, walking up to the level of self
+            parent = destination
+            while parent and self.level < parent.level:
+                parent = parent.get_parent()
+            if parent is self:
                 raise WorkFlowyException('Destination cannot be a child of self')
-            parent = parent.get_parent()
-            # Break if the parent is the root
-            if not parent:
-                break
-        
-        self.transport.listRequest('move', {
-            'projectid': self.id,
-            'parentid': destination.id,
-            'priority': priority
-        })
-
-        # Update the levels
-        self.__update_levels(destination.level + 1)
-        
         
-        # Update the main list
-        self.main_list.all_lists[self.id] = self
-        # Update the parent_ids
-        self.main_list.parent_ids[self.id] = destination.get_id()
+            self.main_list.push_operations([{'type': 'move', 'data': {
+                'projectid': self.id,
+                'parentid': destination.id,
+                'priority': priority
+            }}])
 
-        # Update the sublists
-        source_parent.sublists.remove(self)
-        destination.sublists.insert(priority, self)
+            # Update the local tree
+            with self.main_list.lock.write():
+                self.main_list.detach_list(self, moving=True)
+                self.main_list.attach_list(self, destination, priority)
 
 
     def delete(self):
@@ -343,12 +468,11 @@ class WorkFlowyList:
         if self.level == 0:
             raise WorkFlowyException('Deleting the root is not currently supported')
 
-        self.transport.listRequest('delete', {
-            'projectid': self.id
-        })
-        self.get_parent().sublists.remove(self)
-        self.main_list.all_lists.pop(self.id)
-        self.main_list.parent_ids.pop(self.id)
+        with self.transport.lock:
+            self.main_list.push_operations([{'type': 'delete', 'data': {
+                'projectid': self.id
+            }}])
+            self.main_list.detach_list(self)
 
 
     def create_sublist(self, name: str = None, description: str = None, priority: int = 0):
@@ -360,48 +484,183 @@ class WorkFlowyList:
             description (str, optional): The description of the new sublist. Defaults to None.
             priority (int, optional): The priority of the new sublist. Defaults to 0.
         """
-        new_id = self.__generate_id()
+        new_id = self.generate_id()
+
+        with self.transport.lock:
+            if self.level > 0 and self.main_list.all_lists.get(self.id) is not self:
+                raise WorkFlowyException(f"List {self.id} not found")
 
-        self.transport.listRequest('create', {
-            'projectid': new_id,
-            'parentid': self.id,
-            'priority': priority,
-        })
+            operations = [{'type': 'create', 'data': {
+                'projectid': new_id,
+                'parentid': self.id,
+                'priority': priority,
+            }}]
 
-        properties = {}
+            properties = {}
 
-        if name:
-            properties['name'] = name
-        if description:
-            properties['description'] = description
+            if name:
+                properties['name'] = name
+            if description:
+                properties['description'] = description
         
-        if properties: # Only send the request if there are properties to set
-            self.transport.listRequest('edit', {
-                'projectid': new_id,
-                **properties # Merge the properties into the request
-            })
+            if properties: # Only send the edit if there are properties to set
+                operations.append({'type': 'edit', 'data': {
+                    'projectid': new_id,
+                    **properties # Merge the properties into the request
+                }})
+
+            # Create and edit in the same request
+            self.main_list.push_operations(operations)
     
-        # Update the main list
-        new_list = WorkFlowyList(
-            id=new_id,
-            name=name,
-            description=description,
-            level=self.level + 1,
-            creation_time=0,
-            last_modified_time=0,
-            completed_time=0,
-            sublists=[],
-            main_list=self.main_list,
-            transport=self.transport
-        )
-        self.main_list.all_lists[new_id] = new_list
-        self.main_list.parent_ids[new_id] = self.id
-        self.sublists.insert(priority, new_list)
-
-
-    def __generate_id(self):
-        """
-        Generate a unique identifier for the list.
+            # Update the main list
+            new_list = WorkFlowyList(
+                id=new_id,
+                name=name,
+                description=description,
+                level=self.level + 1,
+                creation_time=0,
+                last_modified_time=0,
+                completed_time=0,
+                sublists=[],
+                main_list=self.main_list,
+                transport=self.transport
+            )
+            self.main_list.attach_list(new_list, self, priority)
+
+
+    def clone_to(self, destination, times: int = 1, priority: int = 0):
+        """
+        Copy the list and all its sublists into another list, for example to instantiate a template.
+
+        The IDs of the copies are generated locally, so all the copies are created in as few requests as
+        the batch limits allow and added to the local tree in a single update. Names and descriptions
+        are copied, completion is not. Sublists left out when the tree was built are loaded first, so
+        the copies are complete. If a request fails after earlier ones were accepted, the lists
+        those created are already in the local tree when the exception is raised.
+
+        Args:
+            destination (WorkFlowyList): The list to copy into.
+            times (int, optional): The number of copies to make. Defaults to 1.
+            priority (int, optional): The position of the first copy among the sublists of the destination. Defaults to 0.
+
+        Returns:
+            list: The WorkFlowyList objects of the copies, in order.
+
+        Raises:
+            WorkFlowyException: If the destination is not a WorkFlowyList object, if self is the root,
+                                if times is not positive, or if either list is not in the tree.
+        """
+        if not isinstance(destination, self.__class__):
+            raise WorkFlowyException('Destination must be a WorkFlowyList object')
+
+        if self.level == 0:
+            raise WorkFlowyException('Cloning the root is not currently supported')
+
+        if not isinstance(times, int) or times < 1:
+            raise WorkFlowyException('Times must be a positive integer')
+
+        with self.transport.lock:
+            for sublist in (self, destination):
+                if sublist.level > 0 and self.main_list.all_lists.get(sublist.id) is not sublist:
+                    raise WorkFlowyException(f"List {sublist.id} not found")
+
+            # Lists pruned by build_list() are part of the template too
+            stack = [self]
+            while stack:
+                current = stack.pop()
+                if current.has_pruned_sublists():
+                    current.expand()
+                stack.extend(current.get_sublists())
+
+            # Take the source subtree in creation order, parents before their sublists
+            with self.main_list.lock.read():
+                source = []
+                stack = [(self, -1, 0)]
+                while stack:
+                    current, parent_index, position = stack.pop()
+                    source.append((current.name, current.description, parent_index, position))
+                    index = len(source) - 1
+                    for child_position in range(len(current.sublists) - 1, -1, -1):
+                        stack.append((current.sublists[child_position], index, child_position))
+
+            operations = []
+            copies = []
+            created = []
+            for copy in range(times):
+                new_lists = []
+                for name, description, parent_index, position in source:
+                    new_id = self.generate_id()
+                    parent_id = destination.id if parent_index == -1 else new_lists[parent_index].id
+                    operations.append({'type': 'create', 'data': {
+                        'projectid': new_id,
+                        'parentid': parent_id,
+                        'priority': priority + copy if parent_index == -1 else position,
+                    }})
+
+                    properties = {}
+                    if name:
+                        properties['name'] = name
+                    if description:
+                        properties['description'] = description
+                    if properties:
+                        operations.append({'type': 'edit', 'data': {
+                            'projectid': new_id,
+                            **properties
+                        }})
+
+                    new_list = WorkFlowyList(
+                        id=new_id,
+                        name=name,
+                        description=description,
+                        level=0,
+                        creation_time=0,
+                        last_modified_time=0,
+                        completed_time=0,
+                        sublists=[],
+                        main_list=self.main_list,
+                        transport=self.transport
+                    )
+                    if parent_index != -1:
+                        new_lists[parent_index].sublists.append(new_list)
+                    new_lists.append(new_list)
+                copies.append(new_lists[0])
+                created.extend(new_lists)
+
+            try:
+                self.main_list.push_operations(operations)
+            except Exception:
+                # The copies never join the tree, the lists WorkFlowy accepted are created by push_operations()
+                for new_list in created:
+                    new_list.release_text()
+                raise
+
+            # Levels, parents and hashes are set by the bulk update
+            self.main_list.attach_lists(copies, destination, priority)
+        return copies
+
+
+    def __subtree_ids(self):
+        """
+        Get the IDs of the list and all its sublists. The root itself is left out.
+
+        Returns:
+            list: The IDs of the lists in the subtree.
+        """
+        with self.main_list.lock.read():
+            ids = []
+            stack = [self]
+            while stack:
+                current = stack.pop()
+                if current.level > 0:
+                    ids.append(current.id)
+                stack.extend(reversed(current.sublists))
+            return ids
+
+
+    @staticmethod
+    def generate_id():
+        """
+        Generate a unique identifier for a new list, in the format used by WorkFlowy.
 
         Returns:
             str: The generated unique identifier.
@@ -422,15 +681,3 @@ class WorkFlowyList:
             id_parts.append(id_part)
 
         return ''.join(id_parts)
-
-
-    def __update_levels(self, level: int):
-        """
-        Update levels for self and all its sublists recursively.
-
-        Args:
-            level (int): The new level to set for the list and its sublists.
-        """
-        self.level = level
-        for sublist in self.sublists:
-            sublist.__update_levels(level + 1)
\ No newline at end of file
@@ -0,0 +1,130 @@
+from workflowy_exception import WorkFlowyException
+from contextlib import contextmanager
+import threading
+
+class WorkFlowyLock:
+    """
+    A readers-writer lock protecting a WorkFlowy tree.
+
+    Any number of threads can read at the same time, while writers get exclusive access. Waiting writers
+    are served before new readers so that a steady stream of reads cannot starve them. Both sides are
+    re-entrant: a thread holding the lock can acquire it again, and a writer can also read. A reader
+    cannot upgrade to a writer, since two readers doing so would wait on each other forever.
+
+    Attributes:
+        condition (threading.Condition): The condition guarding the state of the lock.
+        readers (int): The number of threads currently reading.
+        writer (int): The identifier of the thread currently writing, or None.
+        writer_depth (int): The number of times the writer acquired the lock.
+        waiting_writers (int): The number of threads waiting to write.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.writer_depth = 0
+        self.waiting_writers = 0
+        self.local = threading.local()
+
+
+    @contextmanager
+    def read(self):
+        """
+        Hold the lock for reading for the duration of a with block.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+
+    @contextmanager
+    def write(self):
+        """
+        Hold the lock for writing for the duration of a with block.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+    def acquire_read(self):
+        """
+        Acquire the lock for reading, waiting for the writer and any waiting writers first.
+        """
+        reads = self.__reads()
+        me = threading.get_ident()
+        with self.condition:
+            # A writer reading its own changes does not count as a reader
+            if self.writer == me:
+                reads.append(False)
+                return
+            if not reads:
+                while self.writer is not None or self.waiting_writers:
+                    self.condition.wait()
+            self.readers += 1
+            reads.append(True)
+
+
+    def release_read(self):
+        """
+        Release the lock acquired by the last call to acquire_read() from this thread.
+        """
+        if not self.__reads().pop():
+            return
+        with self.condition:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+
+    def acquire_write(self):
+        """
+        Acquire the lock for writing, waiting for all readers and the current writer to finish.
+
+        Raises:
+            WorkFlowyException: If the thread is holding the lock for reading.
+        """
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer == me:
+                self.writer_depth += 1
+                return
+            if any(self.__reads()):
+                raise WorkFlowyException('Cannot write while holding the lock for reading')
+
+            self.waiting_writers += 1
+            try:
+                while self.writer is not None or self.readers:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers -= 1
+            self.writer = me
+            self.writer_depth = 1
+
+
+    def release_write(self):
+        """
+        Release the lock acquired by the last call to acquire_write() from this thread.
+        """
+        with self.condition:
+            self.writer_depth -= 1
+            if self.writer_depth == 0:
+                self.writer = None
+                self.condition.notify_all()
+
+
+    def __reads(self):
+        """
+        Get the read acquisitions of the current thread, True for each one counted in readers.
+
+        Returns:
+            list: The read acquisitions, most recent last.
+        """
+        if not hasattr(self.local, 'reads'):
+            self.local.reads = []
+        return self.local.reads
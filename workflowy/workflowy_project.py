@@ -1,66 +1,286 @@
 from workflowy_transport import WorkFlowyTransport
 from workflowy_list import WorkFlowyList
+from workflowy_exception import WorkFlowyException
+from workflowy_lock import WorkFlowyLock
+from workflowy_text import WorkFlowyTextStore
+from workflowy_build import compute_hash, convert_parallel
+import bisect, json, time
 
 class WorkFlowyProject:
     '''
     Represents a WorkFlowy project.
 
+    A project can be shared between threads. Reads of the tree hold lock for reading and run in parallel,
+    while changes to the local tree hold it for writing. Operations are submitted to WorkFlowy one at a time
+    under the transport lock, which is held until their local changes are applied, so the local tree sees
+    changes in the same order as the server. Network requests never hold the tree lock, so readers only
+    wait for local updates.
+
+    Listeners are called with (event, sublists, parent) after each change to the local tree, local or remote,
+    while the lock is held for writing. The events are 'loaded' when the tree is built, with the root,
+    'attached' and 'detached' when lists and their sublists are inserted under or removed from parent, and
+    'changed' when the name, description or completion of lists change. An exception raised by a listener is
+    stored in last_listener_error and does not stop the change or the other listeners.
+
     Attributes:
         dateJoinedTimestampInSeconds (int): The timestamp when the user joined the project.
         transport (WorkFlowyTransport): The transport object used for communication with the WorkFlowy API.
+        pruned_lists (dict): The stubs of the lists left out by build_list(), keyed by list ID.
+        pruned_index (dict): The ID of the stub containing each list inside a pruned region, or None until it is needed.
+        pruned_parents (dict): The IDs of the stubs directly under each list, keyed by parent ID.
+        pending_events (list): The (event, WorkFlowyList) tuples of remote changes not yet returned by poll_changes().
+        record_events (bool): Whether remote changes received with local operations are queued in pending_events.
+        hashes (dict): The content hashes of the loaded subtrees, keyed like all_lists.
+        lock (WorkFlowyLock): The readers-writer lock protecting the local tree.
+        text_store (WorkFlowyTextStore): The shared storage for the names and descriptions of the lists.
+        compress_descriptions (bool): Whether long descriptions are stored compressed.
+        listeners (list): The callbacks called after each change to the local tree.
+        last_listener_error (Exception): The last exception raised by a listener, or None.
 
     Methods:
-        __init__(session_id): Initializes a WorkFlowyProject object with the given session ID.
-        build_list(): Retrieves the main list of the project.
-        __parse_tree(raw_list, parent_id, level): Parses the given list and builds a WorkFlowyList object.
+        __init__(session_id, compress_descriptions, session_manager): Initializes a WorkFlowyProject object with the given session ID.
+        build_list(skip_completed, max_depth, root_ids, workers): Retrieves the main list of the project.
+        load_tree(init_data, skip_completed, max_depth, root_ids, workers): Builds the main list from initialization data.
+        expand_list(id, skip_completed, max_depth): Loads a list that was pruned by build_list().
+        get_pruned_ids(parent): Retrieves the IDs of the pruned lists directly under the given list.
+        get_pruned_root(id): Retrieves the ID of the stub containing a list inside a pruned region.
+        __parse_tree(raw_list, parent_id, level, skip_completed, max_depth, root_ids): Parses the given list and builds a WorkFlowyList object.
+        __merge_chunks(chunks, raw_lists): Builds the main list from chunks converted by worker processes.
         get_list_parent(id): Retrieves the parent list of the list with the given ID.
+        push_operations(operations): Pushes operations and applies the concurrent remote changes.
+        poll_changes(): Polls for remote changes and returns the resulting events.
+        apply_operations(operations, timestamp): Applies operations to the local tree.
+        add_listener(callback): Registers a callback called after each change to the local tree.
+        remove_listener(callback): Unregisters a callback.
+        attach_list(sublist, parent, priority): Inserts a list into the local tree.
+        attach_lists(sublists, parent, priority): Inserts consecutive lists into the local tree in one update.
+        detach_list(sublist, moving): Removes a list from the local tree.
+        get_hash(sublist): Retrieves the content hash of the subtree under a list.
+        update_hashes(sublist): Recomputes the hashes of a list and its ancestors.
+        set_complete(ids, complete): Sets the completion status of many lists in a single request.
+        rename_lists(ids, function): Renames many lists in a single request.
+        diff(other): Compares the tree with another one.
+        compute_hash(id, name, description, completed, child_hashes): Computes the content hash of a subtree.
     '''
 
     dateJoinedTimestampInSeconds = 0
 
-    def __init__(self, session_id):
+    def __init__(self, session_id, compress_descriptions: bool = False, session_manager=None):
         '''
         Constructor for WorkFlowyProject.
 
         Args:
             session_id (str): The session ID of the user.
+            compress_descriptions (bool, optional): Whether long descriptions are stored compressed. Defaults to False.
+            session_manager (WorkFlowySessionManager, optional): The manager renewing the session when it is rejected. Defaults to None.
         '''
-        self.transport = WorkFlowyTransport(session_id=session_id)
+        self.transport = WorkFlowyTransport(session_id=session_id, session_manager=session_manager)
+        self.compress_descriptions = compress_descriptions
+        self.text_store = WorkFlowyTextStore(compress=compress_descriptions)
+        self.pending_events = []
+        self.record_events = False
+        self.lock = WorkFlowyLock()
+        self.listeners = []
+        self.last_listener_error = None
 
-    def build_list(self):
+    def build_list(self, skip_completed: bool = False, max_depth: int = None, root_ids: list = None, workers: int = None):
         '''
         Retrieves the main list of the project.
 
+        Pruned regions of the tree are not turned into WorkFlowyList objects. They are recorded
+        as stubs in pruned_lists and can be loaded later with expand_list().
+
+        Args:
+            skip_completed (bool, optional): If True, completed lists and their sublists are pruned. Defaults to False.
+            max_depth (int, optional): The deepest level to load. Lists below it are pruned. Defaults to None (no limit).
+            root_ids (list, optional): If given, only the subtrees under these list IDs (and the lists leading to them) are loaded. Defaults to None.
+            workers (int, optional): If given, the tree is converted by this many worker processes. Defaults to None (no workers).
+
         Returns:
             WorkFlowyList: The main list of the project.
         '''
-        init_data = WorkFlowyTransport.get_initialization_data(self.transport)
-        raw_list = []
-        self.parent_ids = {}
-        self.all_lists = {}
+        with self.transport.lock:
+            init_data = WorkFlowyTransport.get_initialization_data(self.transport)
+            return self.load_tree(init_data, skip_completed=skip_completed, max_depth=max_depth, root_ids=root_ids, workers=workers)
+
+    def load_tree(self, init_data: dict, skip_completed: bool = False, max_depth: int = None, root_ids: list = None, workers: int = None):
+        '''
+        Builds the main list of the project from initialization data.
+
+        With workers, the top level lists are split into chunks that are converted in a process pool and merged
+        in order, which gives exactly the same tree as the sequential build. This only pays off for accounts with
+        a very large number of lists. It is not used together with root_ids.
+
+        Args:
+            init_data (dict): The initialization data, as returned by WorkFlowyTransport.get_initialization_data().
+            skip_completed (bool, optional): If True, completed lists and their sublists are pruned. Defaults to False.
+            max_depth (int, optional): The deepest level to load. Lists below it are pruned. Defaults to None (no limit).
+            root_ids (list, optional): If given, only the subtrees under these list IDs (and the lists leading to them) are loaded. Defaults to None.
+            workers (int, optional): If given, the tree is converted by this many worker processes. Defaults to None (no workers).
+
+        Returns:
+            WorkFlowyList: The main list of the project.
+        '''
+        with self.lock.write():
+            raw_list = []
+            self.parent_ids = {}
+            self.all_lists = {}
+            self.pruned_lists = {}
+            self.pruned_index = None
+            self.pruned_parents = {}
+            self.pending_events = []
+            self.hashes = {}
+            # The previous tree keeps the previous store, which goes away with it, so nothing needs releasing
+            self.text_store = WorkFlowyTextStore(compress=self.compress_descriptions)
+
+            if init_data['projectTreeData']['mainProjectTreeInfo']['rootProjectChildren']:
+                raw_list = init_data['projectTreeData']['mainProjectTreeInfo']['rootProjectChildren']
+
+            if init_data['projectTreeData']['mainProjectTreeInfo']['dateJoinedTimestampInSeconds']:
+                self.dateJoinedTimestampInSeconds = init_data['projectTreeData']['mainProjectTreeInfo']['dateJoinedTimestampInSeconds']
+
+            if init_data['projectTreeData']['clientId']:
+                self.transport.client_id = init_data['projectTreeData']['clientId']
+
+            if init_data['projectTreeData']['mainProjectTreeInfo']['initialMostRecentOperationTransactionId']:
+                self.transport.most_recent_operation_transaction_id = init_data['projectTreeData']['mainProjectTreeInfo']['initialMostRecentOperationTransactionId']
+
+            if workers and root_ids is None:
+                main_list = self.__merge_chunks(convert_parallel(raw_list, workers, self.dateJoinedTimestampInSeconds,
+                                                                 skip_completed=skip_completed, max_depth=max_depth), raw_list)
+                self.__notify('loaded', [main_list])
+                return main_list
+
+            main_list = self.__parse_tree(raw_list={
+                                        'id': None,
+                                        'nm': None,
+                                        'no': None,
+                                        'ct': None,
+                                        'lm': 0,
+                                        'ch': raw_list
+                                     }, parent_id=False, level=0,
+                                     skip_completed=skip_completed,
+                                     max_depth=max_depth,
+                                     root_ids=set(root_ids) if root_ids is not None else None)
+            self.__notify('loaded', [main_list])
+            return main_list
+
+    def expand_list(self, id: str, skip_completed: bool = False, max_depth: int = None):
+        '''
+        Loads a list that was pruned by build_list() and attaches it to its parent.
+
+        Args:
+            id (str): The ID of the pruned list.
+            skip_completed (bool, optional): If True, completed sublists stay pruned. Defaults to False.
+            max_depth (int, optional): The deepest level to load. Defaults to None (no limit).
+
+        Returns:
+            WorkFlowyList: The loaded list.
+
+        Raises:
+            WorkFlowyException: If the list with the given ID is not pruned.
+        '''
+        with self.lock.write():
+            if id in self.all_lists: # Another thread may have loaded it already
+                return self.all_lists[id]
+            if id not in self.pruned_lists:
+                raise WorkFlowyException(f"List {id} is not pruned")
+
+            stub = self.__remove_stub(id)
+            parent = self.all_lists.get(stub['parent_id'])
+            if parent is None:
+                raise WorkFlowyException(f"List {id} not found")
+
+            # The parent may have moved since the tree was built, so the level is taken from it
+            sublist = self.__parse_tree(stub['raw'], stub['parent_id'], parent.level + 1,
+                                        skip_completed=skip_completed, max_depth=max_depth)
+
+            # Keep the original order among the siblings that are already loaded
+            position = 0
+            for sibling in stub['siblings'][:stub['index']]:
+                if sibling.get('id') in self.all_lists:
+                    position += 1
+            parent.sublists.insert(min(position, len(parent.sublists)), sublist)
+            self.__notify('attached', [sublist], parent)
+            self.__rehash([parent], notify=False)
+            return sublist
+
+    def get_pruned_ids(self, parent):
+        '''
+        Retrieves the IDs of the pruned lists directly under the given list.
 
-        if init_data['projectTreeData']['mainProjectTreeInfo']['rootProjectChildren']:
-            raw_list = init_data['projectTreeData']['mainProjectTreeInfo']['rootProjectChildren']
+        Args:
+            parent (WorkFlowyList): The parent list.
 
-        if init_data['projectTreeData']['mainProjectTreeInfo']['dateJoinedTimestampInSeconds']:
-            self.dateJoinedTimestampInSeconds = init_data['projectTreeData']['mainProjectTreeInfo']['dateJoinedTimestampInSeconds']
+        Returns:
+            list: The IDs of the pruned sublists.
+        '''
+        with self.lock.read():
+            if self.all_lists.get(self.__key(parent)) is not parent:
+                return []
+            return list(self.pruned_parents.get(self.__key(parent), ()))
 
-        if init_data['projectTreeData']['clientId']:
-            self.transport.client_id = init_data['projectTreeData']['clientId']
+    def get_pruned_root(self, id: str):
+        '''
+        Retrieves the ID of the stub containing a list inside a pruned region. Expanding that stub loads the list.
 
-        if init_data['projectTreeData']['mainProjectTreeInfo']['initialMostRecentOperationTransactionId']:
-            self.transport.most_recent_operation_transaction_id = init_data['projectTreeData']['mainProjectTreeInfo']['initialMostRecentOperationTransactionId']
+        The index of the pruned regions is built the first time it is needed, and again after the stubs change.
 
-        return self.__parse_tree(raw_list={
-                                    'id': None,
-                                    'nm': None,
-                                    'no': None,
-                                    'ct': None,
-                                    'lm': 0,
-                                    'ch': raw_list
-                                 }, parent_id=False, level=0)
+        Args:
+            id (str): The ID of the list.
+
+        Returns:
+            str or None: The ID of the stub, which is id itself for the top of a pruned region, or None if the list is not pruned.
+        '''
+        with self.lock.read():
+            if id in self.pruned_lists:
+                return id
+            if not self.pruned_lists:
+                return None
+            pruned_index = self.pruned_index
+            if pruned_index is None:
+                pruned_index = {}
+                for stub_id, stub in self.pruned_lists.items():
+                    stack = list(stub['raw'].get('ch') or [])
+                    while stack:
+                        raw_sublist = stack.pop()
+                        pruned_index[raw_sublist.get('id')] = stub_id
+                        stack.extend(raw_sublist.get('ch') or [])
+                # Readers can build it in parallel, they all build the same index
+                self.pruned_index = pruned_index
+            return pruned_index.get(id)
 
-    def __parse_tree(self, raw_list, parent_id: str, level: int):
+    def __add_stub(self, id: str, stub: dict):
+        '''
+        Records the stub of a pruned list. Must be called with the lock held for writing.
+
+        Args:
+            id (str): The ID of the pruned list.
+            stub (dict): The stub, with "raw", "parent_id", "siblings" and "index" keys.
+        '''
+        self.pruned_lists[id] = stub
+        self.pruned_parents.setdefault(stub['parent_id'], []).append(id)
+        self.pruned_index = None
+
+    def __remove_stub(self, id: str):
+        '''
+        Removes the stub of a pruned list. Must be called with the lock held for writing.
+
+        Args:
+            id (str): The ID of the pruned list.
+
+        Returns:
+            dict: The removed stub.
+        '''
+        stub = self.pruned_lists.pop(id)
+        siblings = self.pruned_parents[stub['parent_id']]
+        siblings.remove(id)
+        if not siblings:
+            del self.pruned_parents[stub['parent_id']]
+        self.pruned_index = None
+        return stub
+
+    def __parse_tree(self, raw_list, parent_id: str, level: int, skip_completed: bool = False, max_depth: int = None, root_ids: set = None):
         '''
         Parses the given list and builds a WorkFlowyList object.
 
@@ -68,9 +288,12 @@ class WorkFlowyProject:
             raw_list (dict): The raw list data to be parsed.
             parent_id (str): The ID of the parent list.
             level (int): The level of the current list in the hierarchy.
+            skip_completed (bool, optional): If True, completed sublists are pruned. Defaults to False.
+            max_depth (int, optional): The deepest level to load. Defaults to None (no limit).
+            root_ids (set, optional): The IDs of the subtrees to keep. Defaults to None (keep everything).
 
         Returns:
-            WorkFlowyList: The parsed WorkFlowyList object.
+            WorkFlowyList or None: The parsed WorkFlowyList object, or None if nothing under it is kept.
         '''
         id = raw_list['id'] if 'id' in raw_list else ''
         name = raw_list['nm'] if 'nm' in raw_list else ''
@@ -83,9 +306,33 @@ class WorkFlowyProject:
         else:
             completed_time = 0
         processed_sublists = []
+        pruned_ids = []
 
-        for raw_sublist in raw_sublists:
-            processed_sublists.append(self.__parse_tree(raw_sublist, id, level + 1))
+        # Everything under a requested root is kept
+        if root_ids is not None and id in root_ids:
+            root_ids = None
+
+        for index, raw_sublist in enumerate(raw_sublists or []):
+            processed_sublist = None
+            if not self.__is_pruned(raw_sublist, level + 1, skip_completed, max_depth):
+                processed_sublist = self.__parse_tree(raw_sublist, id, level + 1, skip_completed, max_depth, root_ids)
+
+            if processed_sublist is None:
+                self.__add_stub(raw_sublist.get('id'), {
+                    'raw': raw_sublist,
+                    'parent_id': id,
+                    'siblings': raw_sublists,
+                    'index': index
+                })
+                pruned_ids.append(raw_sublist.get('id'))
+            else:
+                processed_sublists.append(processed_sublist)
+
+        # Drop lists that only lead to pruned regions, the parent records them as a stub instead
+        if root_ids is not None and parent_id is not False and not processed_sublists:
+            for pruned_id in pruned_ids:
+                self.__remove_stub(pruned_id)
+            return None
 
         sublist = WorkFlowyList(
             id=id,
@@ -104,8 +351,110 @@ class WorkFlowyProject:
             self.parent_ids[id] = parent_id
 
         self.all_lists[id] = sublist
+        self.hashes[id] = self.compute_hash(id, name, description, completed_time != 0,
+                                            [self.hashes[processed_sublist.id] for processed_sublist in processed_sublists])
         return sublist
 
+    def __merge_chunks(self, chunks: list, raw_lists: list):
+        '''
+        Builds the WorkFlowyList objects from the compact chunks converted by worker processes.
+
+        Args:
+            chunks (list): The compact chunks, in order. See workflowy_build.convert_chunk().
+            raw_lists (list): The raw top level lists the chunks were converted from.
+
+        Returns:
+            WorkFlowyList: The main list of the project.
+        '''
+        root_sublists = []
+
+        for chunk in chunks:
+            ids = chunk['ids']
+            parents = chunk['parents']
+            levels = chunk['levels']
+            strings = chunk['strings']
+            names = chunk['names']
+            descriptions = chunk['descriptions']
+            times = chunk['times']
+            hashes = chunk['hashes']
+            pending_sublists = {}
+
+            # Sublists come before their parent, so they are built by the time the parent is
+            for index, id in enumerate(ids):
+                sublist = WorkFlowyList(
+                    id=id,
+                    name=strings[names[index]],
+                    description=strings[descriptions[index]],
+                    level=levels[index],
+                    creation_time=times[3 * index],
+                    last_modified_time=times[3 * index + 1],
+                    completed_time=times[3 * index + 2],
+                    sublists=pending_sublists.pop(index, []),
+                    main_list=self,
+                    transport=self.transport
+                )
+
+                parent = parents[index]
+                if parent == -1:
+                    root_sublists.append(sublist)
+                else:
+                    pending_sublists.setdefault(parent, []).append(sublist)
+                    if ids[parent]:
+                        self.parent_ids[id] = ids[parent]
+
+                self.all_lists[id] = sublist
+                self.hashes[id] = hashes[16 * index:16 * index + 16]
+
+            for path, _ in chunk['stubs']:
+                parent_id = None
+                siblings = raw_lists
+                raw_sublist = raw_lists[path[0]]
+                for position in path[1:]:
+                    parent_id = raw_sublist['id'] if 'id' in raw_sublist else ''
+                    siblings = raw_sublist['ch']
+                    raw_sublist = siblings[position]
+                self.__add_stub(raw_sublist.get('id'), {
+                    'raw': raw_sublist,
+                    'parent_id': parent_id,
+                    'siblings': siblings,
+                    'index': path[-1]
+                })
+
+        root = WorkFlowyList(
+            id=None,
+            name=None,
+            description=None,
+            level=0,
+            creation_time=0,
+            last_modified_time=self.dateJoinedTimestampInSeconds,
+            completed_time=0,
+            sublists=root_sublists,
+            main_list=self,
+            transport=self.transport
+        )
+        self.all_lists[None] = root
+        self.hashes[None] = self.compute_hash(None, None, None, False, [self.hashes[sublist.id] for sublist in root_sublists])
+        return root
+
+    def __is_pruned(self, raw_list, level: int, skip_completed: bool, max_depth: int):
+        '''
+        Checks whether the given raw list is excluded by the pruning options.
+
+        Args:
+            raw_list (dict): The raw list data.
+            level (int): The level the list would have in the hierarchy.
+            skip_completed (bool): If True, completed lists are pruned.
+            max_depth (int): The deepest level to load, or None for no limit.
+
+        Returns:
+            bool: True if the list is pruned, False otherwise.
+        '''
+        if max_depth is not None and level > max_depth:
+            return True
+        if skip_completed and raw_list.get('cp') is not None:
+            return True
+        return False
+
     def get_list_parent(self, id):
         '''
         Retrieves the parent list of the list with the given ID.
@@ -114,9 +463,619 @@ class WorkFlowyProject:
             id (str): The ID of the list.
 
         Returns:
-            WorkFlowyList or False: The parent list of the given ID, or False if the parent list does not exist.
+            WorkFlowyList or None: The parent list of the given ID, or None if the parent list is not in the tree,
+                                   for example because another thread removed it.
+        '''
+        with self.lock.read():
+            parent_id = self.parent_ids[id] if isinstance(id, str) and id in self.parent_ids else None
+            return self.all_lists.get(parent_id)
+
+    def push_operations(self, operations: list):
+        '''
+        Pushes operations to WorkFlowy and applies the remote changes returned with the response.
+
+        The remote changes are applied before the caller applies its own, matching the order in which the server ran them.
+        Their events are queued in pending_events if record_events is set.
+
+        Operations are sent in as few requests as the batch limits of the transport allow. If a request fails after
+        earlier batches were accepted, those batches are applied to the local tree before the exception is raised
+        again, so that the tree matches WorkFlowy and the caller must not apply its own changes.
+
+        Args:
+            operations (list): The operations to push, as dicts with "type" and "data" keys.
+
+        Returns:
+            dict: The response from the API to the last request.
+        '''
+        with self.transport.lock:
+            pushed = []
+            for batch in self.__batches(operations):
+                try:
+                    response = self.transport.push_and_poll(batch)
+                except Exception:
+                    if pushed:
+                        self.apply_operations(pushed)
+                    raise
+                pushed.extend(batch)
+                with self.lock.write():
+                    for transaction in self.__remote_transactions(response):
+                        events = self.apply_operations(transaction.get('ops', []), transaction.get('client_timestamp'))
+                        if self.record_events:
+                            self.pending_events.extend(events)
+        return response
+
+    def poll_changes(self):
+        '''
+        Polls WorkFlowy for changes made by other clients and applies them to the local tree.
+
+        Returns:
+            list: The (event, WorkFlowyList) tuples of the changes, oldest first.
+        '''
+        with self.transport.lock:
+            response = self.transport.push_and_poll([])
+            with self.lock.write():
+                events = self.pending_events
+                self.pending_events = []
+                for transaction in self.__remote_transactions(response):
+                    events.extend(self.apply_operations(transaction.get('ops', []), transaction.get('client_timestamp')))
+        return events
+
+    def apply_operations(self, operations: list, timestamp: int = None):
+        '''
+        Applies operations to the local tree without sending them.
+
+        Operations on lists that are not loaded are ignored.
+
+        Args:
+            operations (list): The operations, as dicts with "type" and "data" keys.
+            timestamp (int, optional): The time of the operations in seconds since the user joined. Defaults to None (now).
+
+        Returns:
+            list: The (event, WorkFlowyList) tuples of the applied operations. The event is one of
+                  'created', 'edited', 'moved', 'completed', 'uncompleted' or 'deleted'.
+        '''
+        if timestamp is not None:
+            modified_time = self.dateJoinedTimestampInSeconds + timestamp
+        else:
+            modified_time = int(time.time())
+        events = []
+
+        with self.lock.write():
+            for operation in operations:
+                action = operation.get('type')
+                data = operation.get('data', {})
+                id = data.get('projectid')
+
+                if action == 'create':
+                    parent = self.__get_operation_parent(data.get('parentid'))
+                    if parent is None or id in self.all_lists:
+                        continue
+                    sublist = WorkFlowyList(
+                        id=id,
+                        name='',
+                        description='',
+                        level=parent.level + 1,
+                        creation_time=modified_time,
+                        last_modified_time=modified_time,
+                        completed_time=0,
+                        sublists=[],
+                        main_list=self,
+                        transport=self.transport
+                    )
+                    self.attach_list(sublist, parent, data.get('priority', 0))
+                    events.append(('created', sublist))
+                    continue
+
+                if action == 'delete' and id in self.pruned_lists:
+                    self.__remove_stub(id)
+
+                if id not in self.all_lists:
+                    continue
+                sublist = self.all_lists[id]
+
+                if action == 'edit':
+                    if 'name' in data:
+                        previous = sublist.name
+                        sublist.name = sublist.text_store.intern(data['name'])
+                        sublist.text_store.release(previous)
+                    if 'description' in data:
+                        sublist.description = data['description']
+                    sublist.last_modified_time = modified_time
+                    self.update_hashes(sublist)
+                    events.append(('edited', sublist))
+                elif action == 'move':
+                    parent = self.__get_operation_parent(data.get('parentid'))
+                    if parent is None:
+                        continue
+                    self.detach_list(sublist, moving=True)
+                    self.attach_list(sublist, parent, data.get('priority', 0))
+                    events.append(('moved', sublist))
+                elif action == 'complete':
+                    sublist.completed_time = modified_time
+                    self.update_hashes(sublist)
+                    events.append(('completed', sublist))
+                elif action == 'uncomplete':
+                    sublist.completed_time = 0
+                    self.update_hashes(sublist)
+                    events.append(('uncompleted', sublist))
+                elif action == 'delete':
+                    self.detach_list(sublist)
+                    events.append(('deleted', sublist))
+
+            return events
+
+    def add_listener(self, callback):
+        '''
+        Registers a callback called after each change to the local tree, with (event, sublists, parent).
+
+        Callbacks are called while the tree is locked for writing, so they should be quick. They can read the tree
+        but must not change it.
+
+        Args:
+            callback (callable): The callback.
+
+        Raises:
+            WorkFlowyException: If the callback is not callable.
+        '''
+        if not callable(callback):
+            raise WorkFlowyException('Callback must be callable')
+        with self.lock.write():
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        '''
+        Unregisters a callback registered with add_listener().
+
+        Args:
+            callback (callable): The callback.
+        '''
+        with self.lock.write():
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+
+    def attach_list(self, sublist, parent, priority: int = 0):
+        '''
+        Inserts a list and its sublists into the local tree under the given parent.
+
+        Args:
+            sublist (WorkFlowyList): The list to insert.
+            parent (WorkFlowyList): The new parent list.
+            priority (int, optional): The position of the list among the sublists of the parent. Defaults to 0.
+        '''
+        self.attach_lists([sublist], parent, priority)
+
+    def attach_lists(self, sublists: list, parent, priority: int = 0):
+        '''
+        Inserts consecutive lists and their sublists into the local tree under the given parent in one update.
+
+        Args:
+            sublists (list): The WorkFlowyList objects to insert, in order.
+            parent (WorkFlowyList): The new parent list.
+            priority (int, optional): The position of the first list among the sublists of the parent. Defaults to 0.
+        '''
+        with self.lock.write():
+            # The root is keyed by None, lists directly under it have no parent ID
+            for sublist in sublists:
+                if parent.level == 0:
+                    self.parent_ids.pop(sublist.id, None)
+                else:
+                    self.parent_ids[sublist.id] = parent.id
+                sublist.level = parent.level + 1
+            parent.sublists[priority:priority] = sublists
+
+            # Update the levels and register the lists with their parents
+            stack = list(sublists)
+            visited = []
+            while stack:
+                current = stack.pop()
+                self.all_lists[current.id] = current
+                visited.append(current)
+                for child in current.sublists:
+                    child.level = current.level + 1
+                    self.parent_ids[child.id] = current.id
+                    stack.append(child)
+
+            # Sublists come after their parent in visited, hash them first
+            for current in reversed(visited):
+                self.hashes[current.id] = self.__hash_sublist(current)
+            self.__notify('attached', sublists, parent)
+            self.__rehash([parent], notify=False)
+
+    def detach_list(self, sublist, moving: bool = False):
+        '''
+        Removes a list and its sublists from the local tree, along with the pruned regions under them.
+        Their names and descriptions are given back to the text store.
+
+        Args:
+            sublist (WorkFlowyList): The list to remove.
+            moving (bool, optional): If True, the list is attached again, so its pruned regions and text are kept. Defaults to False.
+        '''
+        with self.lock.write():
+            parent = self.get_list_parent(sublist.id)
+            if parent and sublist in parent.sublists:
+                parent.sublists.remove(sublist)
+
+            removed = []
+            stack = [sublist]
+            while stack:
+                current = stack.pop()
+                # Only lists still in the tree are released, a list removed twice must not be released twice
+                if self.all_lists.get(current.id) is current:
+                    del self.all_lists[current.id]
+                    removed.append(current)
+                self.parent_ids.pop(current.id, None)
+                self.hashes.pop(current.id, None)
+                stack.extend(current.sublists)
+
+            # The pruned regions under deleted lists go with them
+            if not moving:
+                for current in removed:
+                    for stub_id in list(self.pruned_parents.get(current.id, ())):
+                        self.__remove_stub(stub_id)
+
+            self.__notify('detached', [sublist], parent or None)
+            if not moving:
+                for current in removed:
+                    current.release_text()
+            if parent:
+                self.__rehash([parent], notify=False)
+
+    def get_hash(self, sublist):
+        '''
+        Retrieves the content hash of the subtree under a list.
+
+        The hash covers the IDs, names, descriptions, completion and order of the loaded lists in the subtree,
+        so equal hashes mean identical subtrees. It can be used as a cache validation key.
+
+        Args:
+            sublist (WorkFlowyList): The list.
+
+        Returns:
+            str: The hexadecimal hash of the subtree.
+
+        Raises:
+            WorkFlowyException: If the list is not in the tree.
+        '''
+        with self.lock.read():
+            if self.__key(sublist) not in self.hashes:
+                raise WorkFlowyException(f"List {sublist.id} not found")
+            return self.hashes[self.__key(sublist)].hex()
+
+    def update_hashes(self, sublist):
+        '''
+        Recomputes the hash of a list and of its ancestors after a change.
+
+        Lists that are no longer in the tree are ignored.
+
+        Args:
+            sublist (WorkFlowyList): The changed list.
+        '''
+        self.__rehash([sublist])
+
+    def set_complete(self, ids: list, complete: bool = True):
+        '''
+        Sets the completion status of many lists in a single request.
+
+        Lists already in the requested state are left alone. The completion times and hashes of the
+        changed lists are updated locally in one pass.
+
+        Args:
+            ids (list): The IDs of the lists.
+            complete (bool, optional): True to mark the lists as completed, False to mark them as incomplete. Defaults to True.
+
+        Returns:
+            list: The WorkFlowyList objects whose completion status changed.
+
+        Raises:
+            WorkFlowyException: If a list is not found or is the root.
+        '''
+        with self.transport.lock:
+            changed = [sublist for sublist in self.__get_lists(ids) if sublist.is_completed() != complete]
+            if not changed:
+                return []
+
+            self.push_operations([{'type': 'complete' if complete else 'uncomplete', 'data': {
+                'projectid': sublist.id
+            }} for sublist in changed])
+
+            completed_time = int(time.time()) if complete else 0
+            with self.lock.write():
+                for sublist in changed:
+                    sublist.completed_time = completed_time
+                self.__rehash(changed)
+            return changed
+
+    def rename_lists(self, ids: list, function):
+        '''
+        Renames many lists in a single request.
+
+        Args:
+            ids (list): The IDs of the lists.
+            function (callable): The function called with each WorkFlowyList, returning its new name.
+
+        Returns:
+            list: The WorkFlowyList objects whose name changed.
+
+        Raises:
+            WorkFlowyException: If a list is not found or is the root, or if the function does not return a string.
+        '''
+        with self.transport.lock:
+            names = {}
+            for sublist in self.__get_lists(ids):
+                name = function(sublist)
+                if not isinstance(name, str):
+                    raise WorkFlowyException('Names must be strings')
+                if name != sublist.name:
+                    names[sublist] = name
+            if not names:
+                return []
+
+            self.push_operations([{'type': 'edit', 'data': {
+                'projectid': sublist.id,
+                'name': name
+            }} for sublist, name in names.items()])
+
+            with self.lock.write():
+                for sublist, name in names.items():
+                    previous = sublist.name
+                    sublist.name = sublist.text_store.intern(name)
+                    sublist.text_store.release(previous)
+                self.__rehash(names)
+            return list(names)
+
+    def diff(self, other):
+        '''
+        Compares the tree with another one, usually a later snapshot of the same account.
+
+        Subtrees with equal hashes are skipped, so the time taken grows with the number of changes
+        rather than with the size of the trees. A list is moved if its parent changed, or if its place among
+        the siblings found under the same parent in both trees changed. In that case the fewest lists that
+        explain the new order are reported, so inserting or removing a sibling moves nothing. A list is edited
+        if its name, description or completion changed.
+
+        Args:
+            other (WorkFlowyProject): The project to compare with.
+
+        Returns:
+            dict: The changes that turn this tree into the other one, as lists of WorkFlowyList objects under the
+                  'created', 'deleted', 'moved' and 'edited' keys. Deleted lists come from this tree, the others from the other tree.
+        '''
+        with self.lock.read(), other.lock.read():
+            changes = {'created': [], 'deleted': [], 'moved': [], 'edited': []}
+
+            # Created, moved and edited lists
+            stack = list(other.all_lists[None].sublists)
+            if self.hashes[None] != other.hashes[None]:
+                changes['moved'].extend(self.__reordered(self.all_lists[None].sublists, other.all_lists[None].sublists))
+            while stack:
+                current = stack.pop()
+                if current.id not in self.all_lists:
+                    changes['created'].append(current)
+                    stack.extend(current.sublists)
+                    continue
+
+                previous = self.all_lists[current.id]
+                if self.parent_ids.get(current.id) != other.parent_ids.get(current.id):
+                    changes['moved'].append(current)
+                if (previous.name, previous.description, previous.is_completed()) != (current.name, current.description, current.is_completed()):
+                    changes['edited'].append(current)
+                if self.hashes[current.id] != other.hashes[current.id]:
+                    changes['moved'].extend(self.__reordered(previous.sublists, current.sublists))
+                    stack.extend(current.sublists)
+
+            # Deleted lists
+            stack = list(self.all_lists[None].sublists)
+            while stack:
+                current = stack.pop()
+                if current.id not in other.all_lists:
+                    changes['deleted'].append(current)
+                    stack.extend(current.sublists)
+                elif self.hashes[current.id] != other.hashes[current.id]:
+                    stack.extend(current.sublists)
+
+            return changes
+
+    @staticmethod
+    def __reordered(previous_sublists: list, sublists: list):
+        '''
+        Finds the lists that changed places among the sublists a parent has in both trees.
+
+        The longest run of these lists that kept their relative order stays in place, and the others are reordered.
+
+        Args:
+            previous_sublists (list): The sublists of the parent in the first tree.
+            sublists (list): The sublists of the same parent in the second tree.
+
+        Returns:
+            list: The reordered WorkFlowyList objects, from the second tree.
+        '''
+        positions = {sublist.id: position for position, sublist in enumerate(previous_sublists)}
+        common = [sublist for sublist in sublists if sublist.id in positions]
+
+        # Longest increasing run of previous positions, in O(n log n)
+        tails = []
+        tail_indexes = []
+        links = [-1] * len(common)
+        for index, sublist in enumerate(common):
+            position = positions[sublist.id]
+            length = bisect.bisect_left(tails, position)
+            if length == len(tails):
+                tails.append(position)
+                tail_indexes.append(index)
+            else:
+                tails[length] = position
+                tail_indexes[length] = index
+            links[index] = tail_indexes[length - 1] if length else -1
+
+        kept = set()
+        index = tail_indexes[-1] if tail_indexes else -1
+        while index != -1:
+            kept.add(index)
+            index = links[index]
+        return [sublist for index, sublist in enumerate(common) if index not in kept]
+
+    @staticmethod
+    def compute_hash(id, name, description, completed, child_hashes):
+        '''
+        Computes the content hash of a subtree from the fields of its top list and the hashes of its sublists.
+
+        Args:
+            id (str): The ID of the list.
+            name (str): The name of the list.
+            description (str): The description of the list.
+            completed (bool): Whether the list is completed.
+            child_hashes (list): The hashes of the sublists, in order.
+
+        Returns:
+            bytes: The hash of the subtree.
+        '''
+        return compute_hash(id, name, description, completed, child_hashes)
+
+    def __rehash(self, sublists, notify: bool = True):
+        '''
+        Recomputes the hashes of changed lists and of their ancestors, each one once.
+
+        Args:
+            sublists (list): The changed WorkFlowyList objects. Lists that are no longer in the tree are ignored.
+            notify (bool, optional): Whether the fields of the lists changed, and 'changed' is sent for them. False when only
+                                     their sublists changed. Defaults to True.
+        '''
+        with self.lock.write():
+            affected = {}
+            changed = []
+            for sublist in sublists:
+                current = sublist
+                if self.all_lists.get(self.__key(current)) is not current:
+                    continue
+                changed.append(sublist)
+                # Stop at the first ancestor already collected, the rest of the path is too
+                while current and id(current) not in affected:
+                    affected[id(current)] = current
+                    if current.level == 0:
+                        break
+                    current = self.get_list_parent(current.id)
+
+            # Deepest lists first, so that sublists are hashed before their parent
+            for current in sorted(affected.values(), key=lambda current: current.level, reverse=True):
+                self.hashes[self.__key(current)] = self.__hash_sublist(current)
+            if changed and notify:
+                self.__notify('changed', changed)
+
+    def __notify(self, event: str, sublists: list, parent=None):
+        '''
+        Calls the listeners after a change to the local tree. Must be called while holding the lock for writing.
+
+        Args:
+            event (str): One of 'loaded', 'attached', 'detached' or 'changed'.
+            sublists (list): The WorkFlowyList objects concerned.
+            parent (WorkFlowyList, optional): The parent the lists were attached to or detached from. Defaults to None.
+        '''
+        for callback in list(self.listeners):
+            # A failing listener must not leave the change half applied
+            try:
+                callback(event, sublists, parent)
+            except Exception as e:
+                self.last_listener_error = e
+
+    def __get_lists(self, ids: list):
+        '''
+        Retrieves loaded lists by ID, without duplicates.
+
+        Args:
+            ids (list): The IDs of the lists.
+
+        Returns:
+            list: The WorkFlowyList objects, in order.
+
+        Raises:
+            WorkFlowyException: If a list is not found or is the root.
+        '''
+        with self.lock.read():
+            sublists = {}
+            for id in ids:
+                if not isinstance(id, str) or id not in self.all_lists:
+                    raise WorkFlowyException(f"List {id} not found")
+                sublists[id] = self.all_lists[id]
+            return list(sublists.values())
+
+    def __hash_sublist(self, sublist):
+        '''
+        Computes the hash of a loaded list from the stored hashes of its sublists.
+
+        Args:
+            sublist (WorkFlowyList): The list.
+
+        Returns:
+            bytes: The hash of the subtree.
+        '''
+        return self.compute_hash(self.__key(sublist), sublist.name, sublist.description, sublist.is_completed(),
+                                 [self.hashes[child.id] for child in sublist.sublists])
+
+    def __key(self, sublist):
+        '''
+        Retrieves the key of a list in all_lists and hashes. The root is keyed by None.
+
+        Args:
+            sublist (WorkFlowyList): The list.
+
+        Returns:
+            str or None: The key of the list.
+        '''
+        return None if sublist.level == 0 else sublist.id
+
+    def __get_operation_parent(self, parent_id):
+        '''
+        Retrieves the parent list referenced by an operation.
+
+        Args:
+            parent_id (str): The parent ID of the operation. "None" refers to the root.
+
+        Returns:
+            WorkFlowyList or None: The parent list, or None if it is not loaded.
+        '''
+        if parent_id in (None, 'None'):
+            parent_id = None
+        return self.all_lists.get(parent_id)
+
+    def __batches(self, operations: list):
+        '''
+        Splits operations into batches within the limits of the transport.
+
+        Args:
+            operations (list): The operations.
+
+        Returns:
+            list: The batches of operations, at least one.
+        '''
+        batches = [[]]
+        size = 0
+        for operation in operations:
+            operation_size = len(json.dumps(operation))
+            if batches[-1] and (len(batches[-1]) >= self.transport.MAX_BATCH_OPERATIONS
+                                or size + operation_size > self.transport.MAX_BATCH_BYTES):
+                batches.append([])
+                size = 0
+            batches[-1].append(operation)
+            size += operation_size
+        return batches
+
+    def __remote_transactions(self, response):
+        '''
+        Extracts the remote operation transactions from a push_and_poll response.
+
+        Args:
+            response (dict): The response from the API.
+
+        Returns:
+            list: The transactions, as dicts with an "ops" key.
         '''
-        parent_id = self.parent_ids[id] if isinstance(id, str) and id in self.parent_ids else None
-        return self.all_lists[parent_id] if self.all_lists[parent_id] else False
+        results = response.get('results') if isinstance(response, dict) else None
+        if not results:
+            return []
 
-        
\ No newline at end of file
+        transactions = []
+        for transaction in results[0].get('concurrent_remote_operation_transactions') or []:
+            if isinstance(transaction, str):
+                transaction = json.loads(transaction)
+            transactions.append(transaction)
+        return transactions
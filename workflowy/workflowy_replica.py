@@ -0,0 +1,291 @@
+from workflowy_exception import WorkFlowyException
+import sqlite3, threading
+
+class WorkFlowyReplica:
+    """
+    Mirrors the loaded tree of a WorkFlowy project into a SQLite database, for queries that would otherwise
+    be loops over the lists in Python.
+
+    The lists are stored in the lists table, top level lists having a NULL parent_id:
+
+        lists(id, parent_id, position, level, name, description, creation_time, last_modified_time, completed_time)
+
+    When SQLite has FTS5, the names and descriptions are also indexed in the lists_fts full-text table, kept in
+    sync by triggers. Otherwise search() falls back to LIKE.
+
+    The whole tree is loaded in a single transaction when the replica is created and whenever the tree is built
+    again. After that the replica is updated by a listener of the project for each change to the local tree,
+    local or remote. If an update fails, the replica is loaded again before the next query.
+
+    Attributes:
+        project (WorkFlowyProject): The project being mirrored.
+        path (str): The path of the database, ':memory:' for an in-memory database.
+        connection (sqlite3.Connection): The connection to the database.
+        full_text (bool): Whether the lists_fts full-text table is available.
+        stale (bool): Whether the database must be loaded again before the next query.
+        last_error (Exception): The last exception raised while updating the database, or None.
+        lock (threading.RLock): The lock serialising the use of the connection.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS lists (
+            id TEXT PRIMARY KEY,
+            parent_id TEXT,
+            position INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT NOT NULL,
+            creation_time INTEGER NOT NULL,
+            last_modified_time INTEGER NOT NULL,
+            completed_time INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS lists_parent ON lists(parent_id, position);
+        CREATE INDEX IF NOT EXISTS lists_level ON lists(level);
+    '''
+
+    FULL_TEXT_SCHEMA = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS lists_fts USING fts5(name, description, content='lists');
+    '''
+
+    FULL_TEXT_TRIGGERS = {
+        'lists_fts_insert': '''
+            CREATE TRIGGER IF NOT EXISTS lists_fts_insert AFTER INSERT ON lists BEGIN
+                INSERT INTO lists_fts(rowid, name, description) VALUES (new.rowid, new.name, new.description);
+            END''',
+        'lists_fts_delete': '''
+            CREATE TRIGGER IF NOT EXISTS lists_fts_delete AFTER DELETE ON lists BEGIN
+                INSERT INTO lists_fts(lists_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+            END''',
+        'lists_fts_update': '''
+            CREATE TRIGGER IF NOT EXISTS lists_fts_update AFTER UPDATE OF name, description ON lists BEGIN
+                INSERT INTO lists_fts(lists_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+                INSERT INTO lists_fts(rowid, name, description) VALUES (new.rowid, new.name, new.description);
+            END'''
+    }
+
+    COLUMNS = 'id, parent_id, position, level, name, description, creation_time, last_modified_time, completed_time'
+
+    def __init__(self, project, path: str = ':memory:'):
+        """
+        Initializes a WorkFlowyReplica object, loading the tree if it has been built.
+
+        Args:
+            project (WorkFlowyProject): The project to mirror.
+            path (str, optional): The path of the database. Defaults to ':memory:'.
+        """
+        self.project = project
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.stale = False
+        self.last_error = None
+
+        with self.lock, self.connection:
+            if path != ':memory:':
+                # Other connections can read the file while the replica is updated
+                self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(self.SCHEMA)
+            try:
+                self.connection.executescript(self.FULL_TEXT_SCHEMA)
+                for trigger in self.FULL_TEXT_TRIGGERS.values():
+                    self.connection.execute(trigger)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False
+
+        project.add_listener(self.__on_change)
+        with project.lock.read():
+            if hasattr(project, 'all_lists'):
+                self.load()
+
+
+    def load(self):
+        """
+        Replace the content of the database with the loaded tree, in a single transaction.
+        """
+        with self.project.lock.read(), self.lock:
+            self.__write(self.__load)
+
+
+    def query(self, sql: str, parameters=()):
+        """
+        Run a SQL query on the replica.
+
+        Args:
+            sql (str): The query.
+            parameters (tuple or dict, optional): The parameters of the query. Defaults to ().
+
+        Returns:
+            list: The rows, as sqlite3.Row objects.
+
+        Raises:
+            WorkFlowyException: If the query fails.
+        """
+        if self.stale:
+            self.load()
+        with self.lock:
+            try:
+                return self.connection.execute(sql, parameters).fetchall()
+            except sqlite3.Error as e:
+                raise WorkFlowyException(f"Query failed: {e}")
+
+
+    def search(self, text: str, limit: int = None):
+        """
+        Search the names and descriptions of the lists.
+
+        With full-text search, text is an FTS5 query such as 'meeting notes' or 'meet*', and the results are
+        ranked by relevance. Otherwise lists whose name or description contains text are returned.
+
+        Args:
+            text (str): The search text.
+            limit (int, optional): The maximum number of results. Defaults to None (no limit).
+
+        Returns:
+            list: The matching WorkFlowyList objects.
+
+        Raises:
+            WorkFlowyException: If the search text is not a string or is not a valid query.
+        """
+        if not isinstance(text, str):
+            raise WorkFlowyException('Search text must be a string')
+
+        if self.full_text:
+            sql = 'SELECT lists.id FROM lists_fts JOIN lists ON lists.rowid = lists_fts.rowid WHERE lists_fts MATCH ? ORDER BY rank'
+            parameters = [text]
+        else:
+            pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            sql = "SELECT id FROM lists WHERE name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\' ORDER BY level, position"
+            parameters = [pattern, pattern]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+
+        rows = self.query(sql, parameters)
+        with self.project.lock.read():
+            return [self.project.all_lists[row['id']] for row in rows if row['id'] in self.project.all_lists]
+
+
+    def close(self):
+        """
+        Stop mirroring the project and close the database.
+        """
+        self.project.remove_listener(self.__on_change)
+        with self.lock:
+            self.connection.close()
+
+
+    def __on_change(self, event: str, sublists: list, parent):
+        """
+        Update the database after a change to the local tree. Called by the project with the tree locked for writing.
+
+        Args:
+            event (str): One of 'loaded', 'attached', 'detached' or 'changed'.
+            sublists (list): The WorkFlowyList objects concerned.
+            parent (WorkFlowyList): The parent the lists were attached to or detached from, or None.
+        """
+        with self.lock:
+            if event == 'loaded':
+                self.__write(self.__load)
+            elif not self.stale:
+                self.__write(lambda: self.__update(event, sublists, parent))
+
+
+    def __write(self, function):
+        """
+        Run a function in a transaction, marking the replica as stale if it fails.
+
+        Args:
+            function (callable): The function writing to the database.
+        """
+        try:
+            with self.connection:
+                function()
+            self.stale = False
+        except Exception as e:
+            # The replica is called in the middle of a change to the tree, which must not be interrupted
+            self.last_error = e
+            self.stale = True
+
+
+    def __load(self):
+        """
+        Replace the content of the database with the loaded tree.
+        """
+        # Updating the full-text index row by row is several times slower than rebuilding it once, so the
+        # triggers are dropped for the load. Schema changes are part of the transaction too.
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN')
+        if self.full_text:
+            for trigger in self.FULL_TEXT_TRIGGERS:
+                self.connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+        self.connection.execute('DELETE FROM lists')
+        root = self.project.all_lists[None]
+        self.connection.executemany(f"INSERT INTO lists ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                    self.__rows(root.sublists, None))
+
+        if self.full_text:
+            self.connection.execute("INSERT INTO lists_fts(lists_fts) VALUES ('rebuild')")
+            for trigger in self.FULL_TEXT_TRIGGERS.values():
+                self.connection.execute(trigger)
+
+
+    def __update(self, event: str, sublists: list, parent):
+        """
+        Apply a change to the local tree to the database.
+
+        Args:
+            event (str): One of 'attached', 'detached' or 'changed'.
+            sublists (list): The WorkFlowyList objects concerned.
+            parent (WorkFlowyList): The parent the lists were attached to or detached from, or None.
+        """
+        if event == 'changed':
+            self.connection.executemany(
+                'UPDATE lists SET name = ?, description = ?, level = ?, creation_time = ?, last_modified_time = ?, completed_time = ? WHERE id = ?',
+                [(sublist.name, sublist.description, sublist.level, sublist.creation_time, sublist.last_modified_time,
+                  sublist.completed_time, sublist.id) for sublist in sublists if sublist.level > 0])
+            return
+
+        if event == 'attached':
+            # An upsert keeps the full-text triggers firing, unlike a replace
+            self.connection.executemany(
+                f"INSERT INTO lists ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                + ', '.join(f"{column} = excluded.{column}" for column in self.COLUMNS.split(', ')[1:]),
+                self.__rows(sublists, parent))
+        elif event == 'detached':
+            ids = []
+            stack = list(sublists)
+            while stack:
+                current = stack.pop()
+                ids.append((current.id,))
+                stack.extend(current.sublists)
+            self.connection.executemany('DELETE FROM lists WHERE id = ?', ids)
+
+        # The positions of the siblings after the change have moved
+        if parent is not None:
+            self.connection.executemany('UPDATE lists SET position = ? WHERE id = ? AND position != ?',
+                                        [(position, sublist.id, position) for position, sublist in enumerate(parent.sublists)])
+
+
+    def __rows(self, sublists: list, parent):
+        """
+        Generate the rows of consecutive lists and all their sublists.
+        The positions of the lists themselves are counted from 0.
+
+        Args:
+            sublists (list): The WorkFlowyList objects.
+            parent (WorkFlowyList): Their parent, or None for the root.
+
+        Yields:
+            tuple: The values of the row of each list, in the order of COLUMNS.
+        """
+        parent_id = parent.id if parent is not None and parent.level > 0 else None
+        stack = [(sublists[position], parent_id, position) for position in range(len(sublists) - 1, -1, -1)]
+        while stack:
+            current, parent_id, position = stack.pop()
+            yield (current.id, parent_id, position, current.level, current.name, current.description,
+                   current.creation_time, current.last_modified_time, current.completed_time)
+            for child_position in range(len(current.sublists) - 1, -1, -1):
+                stack.append((current.sublists[child_position], current.id, child_position))
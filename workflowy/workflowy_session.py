@@ -0,0 +1,207 @@
+from workflowy_exception import WorkFlowyException
+from workflowy_transport import WorkFlowyTransport
+from contextlib import contextmanager
+import hashlib, json, os, re, tempfile, threading, time
+
+try:
+    import fcntl
+except ImportError:
+    # Without fcntl, logins are only coordinated between the threads of a process
+    fcntl = None
+
+class WorkFlowySessionManager:
+    """
+    Caches the session ID of a user on disk so that it can be reused by other processes.
+
+    The session is stored in a file named after a hash of the username, readable only by its owner. A cached
+    session is validated locally before reuse, without a request to WorkFlowy: it must be well formed, younger
+    than max_age, owned by the current user and not readable by others. A new login is only made when there is
+    no valid cached session, or when WorkFlowy rejects the cached one. Logins hold a lock file, and the cache is
+    read again once the lock is held, so when many processes start at once only one of them logs in.
+
+    Attributes:
+        username (str): The username of the account.
+        cache_dir (str): The directory holding the cached sessions.
+        max_age (float): The longest time a cached session is reused for, in seconds.
+        path (str): The file holding the cached session.
+        lock_path (str): The lock file held while logging in.
+        lock (threading.Lock): The lock coordinating logins between the threads of this process.
+    """
+
+    MAX_AGE = 7 * 24 * 3600
+
+    def __init__(self, username: str, password: str = None, cache_dir: str = None, max_age: float = MAX_AGE):
+        """
+        Initializes a WorkFlowySessionManager object.
+
+        Args:
+            username (str): The username of the account.
+            password (str, optional): The password of the account. Without it only cached sessions can be used. Defaults to None.
+            cache_dir (str, optional): The directory holding the cached sessions. Defaults to workflowy in the user cache directory.
+            max_age (float, optional): The longest time a cached session is reused for, in seconds. Defaults to 7 days.
+
+        Raises:
+            WorkFlowyException: If the username is not provided.
+        """
+        if not username:
+            raise WorkFlowyException("Username not provided.")
+
+        if cache_dir is None:
+            cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            cache_dir = os.path.join(cache_home, 'workflowy')
+
+        self.username = username
+        self.__password = password
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        name = hashlib.sha256(username.encode('utf-8')).hexdigest()
+        self.path = os.path.join(cache_dir, name + '.json')
+        self.lock_path = os.path.join(cache_dir, name + '.lock')
+        self.lock = threading.Lock()
+
+
+    def get_session_id(self):
+        """
+        Get a session ID, logging in only if there is no valid cached session.
+
+        Returns:
+            str: The session ID.
+
+        Raises:
+            WorkFlowyException: If a login is needed and fails.
+        """
+        session_id = self.__read()
+        if session_id:
+            return session_id
+
+        with self.__locked():
+            # Another process may have logged in while this one waited for the lock
+            session_id = self.__read()
+            if session_id:
+                return session_id
+            return self.__login()
+
+
+    def refresh(self, rejected_session_id: str):
+        """
+        Get a new session ID after WorkFlowy rejected the given one.
+
+        If another process already replaced the rejected session, its session is used instead of logging in again.
+
+        Args:
+            rejected_session_id (str): The session ID that was rejected.
+
+        Returns:
+            str: The new session ID.
+
+        Raises:
+            WorkFlowyException: If the login fails.
+        """
+        with self.__locked():
+            session_id = self.__read()
+            if session_id and session_id != rejected_session_id:
+                return session_id
+            return self.__login()
+
+
+    def invalidate(self):
+        """
+        Remove the cached session, so that the next get_session_id() logs in.
+        """
+        with self.__locked():
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+    def __login(self):
+        """
+        Log in and cache the new session. Must be called while holding the lock.
+
+        Returns:
+            str: The new session ID.
+
+        Raises:
+            WorkFlowyException: If the password is not available or the login fails.
+        """
+        if not self.__password:
+            raise WorkFlowyException("No valid cached session and no password provided.")
+
+        session_id = WorkFlowyTransport().login_request(self.username, self.__password)
+        if not session_id:
+            raise WorkFlowyException("Login failed")
+        self.__write(session_id)
+        return session_id
+
+
+    def __read(self):
+        """
+        Read the cached session and validate it locally.
+
+        Returns:
+            str: The cached session ID, or None if there is no valid cached session.
+        """
+        try:
+            with open(self.path, 'r') as file:
+                status = os.fstat(file.fileno())
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        # Do not trust a file others could have written or read
+        if status.st_mode & 0o077:
+            return None
+        if hasattr(os, 'getuid') and status.st_uid != os.getuid():
+            return None
+
+        if not isinstance(data, dict) or data.get('username') != self.username:
+            return None
+        session_id = data.get('session_id')
+        created = data.get('created')
+        if not isinstance(session_id, str) or not re.match('^[a-z0-9]{32}$', session_id):
+            return None
+        if not isinstance(created, (int, float)) or not 0 <= time.time() - created < self.max_age:
+            return None
+        return session_id
+
+
+    def __write(self, session_id: str):
+        """
+        Cache a session, replacing the cached file in one step so that readers never see a partial file.
+
+        Args:
+            session_id (str): The session ID.
+        """
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump({'username': self.username, 'session_id': session_id, 'created': time.time()}, file)
+            os.chmod(temporary_path, 0o600)
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+
+
+    @contextmanager
+    def __locked(self):
+        """
+        Hold the login lock of the user for the duration of a with block, across threads and processes.
+        """
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            descriptor = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(descriptor)
@@ -0,0 +1,478 @@
+from workflowy_exception import WorkFlowyException
+import mmap, os, re, struct, tempfile
+
+class WorkFlowySharedTree:
+    """
+    A read-only WorkFlowy tree in a memory-mapped file, shared by all the processes that open it.
+
+    publish() writes the tree of a project in a flat layout: a header, a table of fixed-size list records,
+    a table of sublist positions, an index of the records sorted by ID and a heap of UTF-8 strings. Processes
+    map the file read-only, so the pages are shared between them instead of each one building its own tree.
+    Lists are read from the mapping when their getters are called.
+
+    A new generation is written to a temporary file and renamed over the old one, so readers never see a
+    partial tree. An open tree keeps using the generation it mapped until refresh() is called, and keeps it
+    mapped until close() is called or the with block it was opened in ends.
+
+    Reads go through a memoryview of the mapping, so looking up, walking and decoding lists does not copy the
+    mapped bytes into intermediate bytes objects.
+
+    Attributes:
+        MAGIC (bytes): The bytes a shared tree file starts with.
+        VERSION (int): The version of the layout.
+        path (str): The path of the file.
+        generation (int): The generation of the tree, increased by each publish().
+        count (int): The number of lists in the tree, the root included.
+        buffer (mmap.mmap): The mapping of the file.
+        view (memoryview): The view of the mapping all reads go through.
+    """
+
+    MAGIC = b'WFSHTREE'
+    VERSION = 1
+
+    # Magic, version, generation, count, and the offsets of the records, sublists, index and heap
+    HEADER = struct.Struct('<8sIQI4Q')
+    # ID, name and description as heap (offset, length), parent, level, first sublist, sublist count,
+    # creation, last modified and completed times, and hash
+    RECORD = struct.Struct('<QIQIQIiiIIqqq16s')
+    POSITION = struct.Struct('<I')
+
+    def __init__(self, path: str):
+        """
+        Maps the current generation of a shared tree.
+
+        Args:
+            path (str): The path of the file written by publish().
+
+        Raises:
+            WorkFlowyException: If the file is missing or is not a shared tree.
+        """
+        try:
+            with open(path, 'rb') as file:
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.inode = os.fstat(file.fileno()).st_ino
+        except (OSError, ValueError) as e:
+            raise WorkFlowyException(f"Cannot open shared tree {path}: {e}")
+
+        if len(self.buffer) < self.HEADER.size:
+            self.buffer.close()
+            raise WorkFlowyException(f"Invalid shared tree {path}")
+        magic, version, generation, count, records, sublists, index, heap = self.HEADER.unpack_from(self.buffer, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.buffer.close()
+            raise WorkFlowyException(f"Invalid shared tree {path}")
+
+        self.view = memoryview(self.buffer)
+
+        self.path = path
+        self.generation = generation
+        self.count = count
+        self.records = records
+        self.sublists = sublists
+        self.index = index
+        self.heap = heap
+
+
+    @staticmethod
+    def publish(project, path: str):
+        """
+        Writes the loaded tree of a project to a shared tree file, replacing the previous generation in one step.
+        Pruned lists are left out.
+
+        Args:
+            project (WorkFlowyProject): The project. Its main list must have been built.
+            path (str): The path of the file, preferably on a memory-backed file system such as /dev/shm.
+
+        Returns:
+            int: The generation written.
+        """
+        try:
+            with WorkFlowySharedTree(path) as previous:
+                generation = previous.generation + 1
+        except WorkFlowyException:
+            generation = 1
+
+        heap = bytearray()
+        strings = {}
+
+        def add_string(value):
+            # Repeated strings are stored once
+            if value not in strings:
+                encoded = value.encode('utf-8')
+                strings[value] = (len(heap), len(encoded))
+                heap.extend(encoded)
+            return strings[value]
+
+        with project.lock.read():
+            # Number the lists in pre-order, so that the sublists of a list follow it
+            lists = []
+            parents = []
+            stack = [(project.all_lists[None], -1)]
+            while stack:
+                current, parent = stack.pop()
+                lists.append(current)
+                parents.append(parent)
+                index = len(lists) - 1
+                for sublist in reversed(current.sublists):
+                    stack.append((sublist, index))
+
+            positions = {id(sublist): index for index, sublist in enumerate(lists)}
+            records = bytearray(WorkFlowySharedTree.RECORD.size * len(lists))
+            sublists = bytearray()
+            first = 0
+            for index, current in enumerate(lists):
+                id_offset, id_length = add_string(current.id)
+                name_offset, name_length = add_string(current.name)
+                description_offset, description_length = add_string(current.description)
+                digest = project.hashes.get(None if current.level == 0 else current.id, bytes(16))
+                WorkFlowySharedTree.RECORD.pack_into(records, index * WorkFlowySharedTree.RECORD.size,
+                    id_offset, id_length, name_offset, name_length, description_offset, description_length,
+                    parents[index], current.level, first, len(current.sublists),
+                    current.creation_time, current.last_modified_time, current.completed_time, digest)
+                for sublist in current.sublists:
+                    sublists += WorkFlowySharedTree.POSITION.pack(positions[id(sublist)])
+                first += len(current.sublists)
+
+            ids = sorted(range(len(lists)), key=lambda index: lists[index].id.encode('utf-8'))
+            index = b''.join(WorkFlowySharedTree.POSITION.pack(position) for position in ids)
+
+        records_offset = WorkFlowySharedTree.HEADER.size
+        sublists_offset = records_offset + len(records)
+        index_offset = sublists_offset + len(sublists)
+        heap_offset = index_offset + len(index)
+        header = WorkFlowySharedTree.HEADER.pack(WorkFlowySharedTree.MAGIC, WorkFlowySharedTree.VERSION, generation,
+                                                 len(lists), records_offset, sublists_offset, index_offset, heap_offset)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for part in (header, records, sublists, index, heap):
+                    file.write(part)
+            os.chmod(temporary_path, 0o600)
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            raise
+        return generation
+
+
+    def refresh(self):
+        """
+        Get the latest generation of the tree.
+
+        Returns:
+            WorkFlowySharedTree: This tree if no newer generation was published, otherwise the newer one.
+                                 Lists of this tree keep reading this generation, which stays mapped until
+                                 close() is called on this tree.
+        """
+        try:
+            if os.stat(self.path).st_ino == self.inode:
+                return self
+        except OSError:
+            return self
+        return WorkFlowySharedTree(self.path)
+
+
+    def close(self):
+        """
+        Unmap the tree and release its file. Lists of this tree cannot be read afterwards.
+        """
+        if self.buffer.closed:
+            return
+        self.view.release()
+        self.buffer.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def get_main_list(self):
+        """
+        Get the root list.
+
+        Returns:
+            WorkFlowySharedList: The root list.
+        """
+        return WorkFlowySharedList(self, 0)
+
+
+    def get_list(self, id: str):
+        """
+        Get the list with the given ID, using a binary search of the ID index.
+
+        Args:
+            id (str): The ID of the list, '' for the root.
+
+        Returns:
+            WorkFlowySharedList: The list.
+
+        Raises:
+            WorkFlowyException: If the list with the given ID is not found.
+        """
+        if not isinstance(id, str):
+            raise WorkFlowyException(f"List {id} not found")
+        key = id.encode('utf-8')
+        view = self.view
+
+        # IDs are compared as big-endian integers of their common prefix, then by length, which orders them like
+        # bytes while reading the candidates in place. The prefix of the key is the whole key for IDs of one length.
+        key_prefixes = {len(key): int.from_bytes(key, 'big')}
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = self.POSITION.unpack_from(view, self.index + middle * self.POSITION.size)[0]
+            offset, length = struct.unpack_from('<QI', view, self.records + position * self.RECORD.size)
+            common = min(length, len(key))
+            start = self.heap + offset
+            candidate = int.from_bytes(view[start:start + common], 'big')
+            if common not in key_prefixes:
+                key_prefixes[common] = int.from_bytes(key[:common], 'big')
+            prefix = key_prefixes[common]
+            if candidate == prefix and length == len(key):
+                return WorkFlowySharedList(self, position)
+            if candidate < prefix or (candidate == prefix and length < len(key)):
+                low = middle + 1
+            else:
+                high = middle
+        raise WorkFlowyException(f"List {id} not found")
+
+
+    def read_record(self, position: int):
+        """
+        Read the record of a list.
+
+        Args:
+            position (int): The position of the list in the record table.
+
+        Returns:
+            tuple: The fields of the record, in the order of RECORD.
+        """
+        return self.RECORD.unpack_from(self.view, self.records + position * self.RECORD.size)
+
+
+    def read_string(self, offset: int, length: int):
+        """
+        Read a string from the heap.
+
+        Args:
+            offset (int): The offset of the string in the heap.
+            length (int): The encoded length of the string.
+
+        Returns:
+            str: The string.
+        """
+        start = self.heap + offset
+        return str(self.view[start:start + length], 'utf-8')
+
+
+    def read_sublists(self, first: int, count: int):
+        """
+        Read the positions of the sublists of a list.
+
+        Args:
+            first (int): The position of the first sublist in the sublist table.
+            count (int): The number of sublists.
+
+        Returns:
+            list: The positions of the sublists in the record table.
+        """
+        start = self.sublists + first * self.POSITION.size
+        return [position for (position,) in self.POSITION.iter_unpack(self.view[start:start + count * self.POSITION.size])]
+
+
+class WorkFlowySharedList:
+    """
+    A read-only view of a list in a WorkFlowySharedTree, with the getters of WorkFlowyList.
+
+    Attributes:
+        tree (WorkFlowySharedTree): The generation of the tree the list belongs to.
+        position (int): The position of the list in the record table.
+    """
+
+    def __init__(self, tree, position: int):
+        """
+        Initializes a WorkFlowySharedList object.
+
+        Args:
+            tree (WorkFlowySharedTree): The tree the list belongs to.
+            position (int): The position of the list in the record table.
+        """
+        self.tree = tree
+        self.position = position
+
+
+    def search_sublist(self, expression: str, get_all: bool = False, exact_match: bool = False):
+        """
+        Search for a sublist by name using regular expression, like WorkFlowyList.search_sublist().
+
+        Args:
+            expression (str): The search expression to match against sublist names.
+            get_all (bool, optional): If True, returns all sublists with matching names. Defaults to False.
+            exact_match (bool, optional): If True, performs an exact match against sublist names. Defaults to False.
+
+        Returns:
+            list: A list of matching sublists in pre-order, or False if no matches are found.
+        """
+        if not isinstance(expression, str):
+            raise WorkFlowyException('Search expression must be a string')
+
+        matches = []
+        stack = [self.position]
+        while stack:
+            position = stack.pop()
+            record = self.tree.read_record(position)
+            name = self.tree.read_string(record[2], record[3])
+            if (exact_match and expression == name) or (not exact_match and re.search(expression, name, re.IGNORECASE)):
+                matches.append(WorkFlowySharedList(self.tree, position))
+                if not get_all:
+                    break
+            stack.extend(reversed(self.tree.read_sublists(record[8], record[9])))
+        return matches if matches else False
+
+
+    def get_id(self):
+        """
+        Get the unique identifier of the list.
+
+        Returns:
+            str: The unique identifier of the list.
+        """
+        record = self.tree.read_record(self.position)
+        return self.tree.read_string(record[0], record[1])
+
+
+    def get_name(self):
+        """
+        Get the name of the list.
+
+        Returns:
+            str: The name of the list.
+        """
+        record = self.tree.read_record(self.position)
+        return self.tree.read_string(record[2], record[3])
+
+
+    def get_description(self):
+        """
+        Get the description of the list.
+
+        Returns:
+            str: The description of the list.
+        """
+        record = self.tree.read_record(self.position)
+        return self.tree.read_string(record[4], record[5])
+
+
+    def get_creation_time(self):
+        """
+        Get the timestamp of when the list was created.
+
+        Returns:
+            int: The timestamp of when the list was created.
+        """
+        return self.tree.read_record(self.position)[10]
+
+
+    def get_last_modified_time(self):
+        """
+        Get the timestamp of when the list was last modified.
+
+        Returns:
+            int: The timestamp of when the list was last modified.
+        """
+        return self.tree.read_record(self.position)[11]
+
+
+    def get_completed_time(self):
+        """
+        Get the timestamp of when the list was completed.
+
+        Returns:
+            int: The timestamp of when the list was completed.
+        """
+        return self.tree.read_record(self.position)[12]
+
+
+    def get_parent(self):
+        """
+        Get the parent list of the current list.
+
+        Returns:
+            WorkFlowySharedList: The parent list, or False for the root.
+        """
+        parent = self.tree.read_record(self.position)[6]
+        return WorkFlowySharedList(self.tree, parent) if parent >= 0 else False
+
+
+    def is_completed(self):
+        """
+        Check if the list is completed.
+
+        Returns:
+            bool: True if the list is completed, False otherwise.
+        """
+        return self.get_completed_time() != 0
+
+
+    def get_level(self):
+        """
+        Get the level of the list in the hierarchy.
+
+        Returns:
+            int: The level of the list in the hierarchy.
+        """
+        return self.tree.read_record(self.position)[7]
+
+
+    def get_hash(self):
+        """
+        Get the content hash of the subtree under the list, as it was when the tree was published.
+
+        Returns:
+            str: The hexadecimal hash of the subtree.
+        """
+        return self.tree.read_record(self.position)[13].hex()
+
+
+    def get_sublists(self):
+        """
+        Get the sublists contained within the list.
+
+        Returns:
+            list: A list of WorkFlowySharedList objects representing the sublists.
+        """
+        record = self.tree.read_record(self.position)
+        return [WorkFlowySharedList(self.tree, position) for position in self.tree.read_sublists(record[8], record[9])]
+
+
+    def get_list(self, id: str):
+        """
+        Get the list with the given ID.
+
+        Args:
+            id (str): The ID of the list to retrieve.
+
+        Returns:
+            WorkFlowySharedList: The list with the given ID.
+
+        Raises:
+            WorkFlowyException: If the list with the given ID is not found.
+        """
+        return self.tree.get_list(id)
+
+
+    def __eq__(self, other):
+        return isinstance(other, WorkFlowySharedList) and self.tree is other.tree and self.position == other.position
+
+
+    def __hash__(self):
+        return hash((id(self.tree), self.position))
@@ -0,0 +1,216 @@
+from array import array
+import threading, zlib
+
+class WorkFlowyTextStore:
+    """
+    Compact storage for the names and descriptions of the lists of a project.
+
+    Descriptions are encoded into a single shared buffer and only decoded into a str when they are read.
+    Identical descriptions are stored once, and empty descriptions are not stored at all. Long descriptions
+    can optionally be compressed.
+
+    Names are read far more often than descriptions, so they stay as str, but repeated names share a
+    single str object.
+
+    Descriptions and names are counted by the lists using them. Lists give them back with release() when they
+    are replaced or when the list leaves the tree. Releases are queued and processed by the next add() or
+    intern(). A description no longer
+    used frees its handle for reuse, and once most of the buffer is unused it is compacted in place, keeping
+    the handles of the remaining descriptions.
+
+    Attributes:
+        compress (bool): Whether long descriptions are compressed.
+        compress_threshold (int): The encoded size in bytes above which descriptions are compressed.
+        buffer (bytearray): The encoded descriptions.
+        offsets (array): The position of each description in the buffer.
+        lengths (array): The encoded size of each description.
+        compressed (array): Whether each description is compressed.
+        counts (array): The number of lists using each description, 0 for a free handle.
+        free (list): The handles available for reuse.
+        unused (int): The size in bytes of the part of the buffer no longer used.
+        name_counts (dict): The number of lists using each name.
+        released (list): The handles and names released and not yet processed.
+    """
+
+    # The smallest unused part of the buffer worth compacting, in bytes
+    COMPACT_MIN = 64 * 1024
+
+    def __init__(self, compress: bool = False, compress_threshold: int = 256):
+        """
+        Initializes a WorkFlowyTextStore object.
+
+        Args:
+            compress (bool, optional): Whether long descriptions are compressed. Defaults to False.
+            compress_threshold (int, optional): The size in bytes above which descriptions are compressed. Defaults to 256.
+        """
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self.buffer = bytearray()
+        self.offsets = array('Q')
+        self.lengths = array('L')
+        self.compressed = array('b')
+        self.counts = array('L')
+        self.free = []
+        self.unused = 0
+        self.handles = {}
+        self.names = {}
+        self.name_counts = {}
+        self.released = []
+        self.lock = threading.Lock()
+
+
+    def add(self, text: str):
+        """
+        Store a description.
+
+        Args:
+            text (str): The description.
+
+        Returns:
+            int: The handle of the description, or None if it is empty.
+        """
+        if not text:
+            return None
+
+        encoded = text.encode('utf-8')
+        key = hash(encoded)
+        with self.lock:
+            self.__process_released()
+
+            # Reuse the stored copy of a repeated description
+            handle = self.handles.get(key)
+            if handle is not None and self.__read(handle) == encoded:
+                self.counts[handle] += 1
+                return handle
+
+            compressed = False
+            if self.compress and len(encoded) > self.compress_threshold:
+                packed = zlib.compress(encoded)
+                if len(packed) < len(encoded):
+                    encoded, compressed = packed, True
+
+            if self.free:
+                handle = self.free.pop()
+                self.offsets[handle] = len(self.buffer)
+                self.lengths[handle] = len(encoded)
+                self.compressed[handle] = compressed
+                self.counts[handle] = 1
+            else:
+                handle = len(self.offsets)
+                self.offsets.append(len(self.buffer))
+                self.lengths.append(len(encoded))
+                self.compressed.append(compressed)
+                self.counts.append(1)
+            self.buffer += encoded
+            self.handles.setdefault(key, handle)
+            return handle
+
+
+    def get(self, handle: int):
+        """
+        Read a description.
+
+        Args:
+            handle (int): The handle returned by add().
+
+        Returns:
+            str: The description, empty if the handle is None.
+        """
+        if handle is None:
+            return ''
+        # The buffer can be compacted by another thread
+        with self.lock:
+            encoded = self.__read(handle)
+        return encoded.decode('utf-8')
+
+
+    def intern(self, name: str):
+        """
+        Get the shared copy of a name.
+
+        Args:
+            name (str): The name.
+
+        Returns:
+            str: An equal str shared by all the lists with this name.
+        """
+        with self.lock:
+            self.__process_released()
+            shared = self.names.setdefault(name, name)
+            self.name_counts[shared] = self.name_counts.get(shared, 0) + 1
+            return shared
+
+
+    def release(self, item):
+        """
+        Give back a description or a name that a list no longer uses.
+
+        Args:
+            item (int or str): The handle of the description, None for an empty one, or the name.
+        """
+        if item is not None:
+            self.released.append(item)
+
+
+    def __process_released(self):
+        """
+        Process the queued releases, freeing the descriptions and names no list uses any more.
+        Must be called while holding the lock.
+        """
+        while self.released:
+            item = self.released.pop()
+            if isinstance(item, str):
+                count = self.name_counts.get(item, 0) - 1
+                if count > 0:
+                    self.name_counts[item] = count
+                elif count == 0:
+                    del self.name_counts[item]
+                    del self.names[item]
+                continue
+
+            if not self.counts[item]:
+                continue
+            self.counts[item] -= 1
+            if self.counts[item]:
+                continue
+            key = hash(self.__read(item))
+            if self.handles.get(key) == item:
+                del self.handles[key]
+            self.unused += self.lengths[item]
+            self.lengths[item] = 0
+            self.free.append(item)
+
+        if self.unused > self.COMPACT_MIN and self.unused * 2 > len(self.buffer):
+            self.__compact()
+
+
+    def __compact(self):
+        """
+        Copy the descriptions still in use into a new buffer, keeping their handles.
+        Must be called while holding the lock.
+        """
+        buffer = bytearray()
+        for handle in range(len(self.offsets)):
+            if self.counts[handle]:
+                offset = self.offsets[handle]
+                self.offsets[handle] = len(buffer)
+                buffer += self.buffer[offset:offset + self.lengths[handle]]
+            else:
+                self.offsets[handle] = 0
+        self.buffer = buffer
+        self.unused = 0
+
+
+    def __read(self, handle: int):
+        """
+        Read the encoded bytes of a description, decompressing them if needed.
+
+        Args:
+            handle (int): The handle of the description.
+
+        Returns:
+            bytes: The UTF-8 encoded description.
+        """
+        offset = self.offsets[handle]
+        encoded = bytes(self.buffer[offset:offset + self.lengths[handle]])
+        return zlib.decompress(encoded) if self.compressed[handle] else encoded
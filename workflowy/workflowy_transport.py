@@ -1,21 +1,34 @@
 import requests
-from workflowy_exception import WorkFlowyException
-import re, json, uuid
+from workflowy_exception import WorkFlowyException, WorkFlowyAuthException
+import re, json, threading, uuid
 
 class WorkFlowyTransport:
     """
     A class representing the transport layer for interacting with the WorkFlowy API.
 
+    A transport can be shared between threads. Each thread gets its own requests session, and push_and_poll
+    requests are sent one at a time under lock so that each one starts from the transaction ID returned by
+    the previous one.
+
+    With a session manager, the session ID is taken from it when the first request is made. If WorkFlowy
+    rejects the session, the manager logs in again and the request is retried once.
+
     Attributes:
         LOGIN_URL (str): The URL for the login endpoint.
         API_URL (str): The base URL for the API.
         TIMEOUT (int): The timeout value for API requests.
+        MAX_BATCH_OPERATIONS (int): The maximum number of operations sent in one push_and_poll request.
+        MAX_BATCH_BYTES (int): The maximum encoded size of the operations sent in one push_and_poll request.
+        lock (threading.RLock): The lock serialising push_and_poll requests and the transaction ID.
+        session_manager (WorkFlowySessionManager): The manager providing and renewing the session ID, or None.
 
     Methods:
-        __init__(self, session_id=False): Initializes a new instance of the WorkFlowyTransport class.
+        __init__(self, session_id=False, session_manager=None): Initializes a new instance of the WorkFlowyTransport class.
         listRequest(self, action: str, data: dict = {}): Handles push_and_poll requests.
+        push_and_poll(self, operations: list = []): Pushes operations and polls for changes.
         get_initialization_data(self): Retrieves the initialization data from the API.
         __api_request(self, endpoint, data={}): Sends an API request to the specified endpoint.
+        __send_request(self, endpoint, data, session_id): Sends a single API request.
         login_request(self, username, password): Sends a login request to the API.
         __generate_uuid(self): Generates an 8-character UUID.
     """
@@ -23,18 +36,22 @@ class WorkFlowyTransport:
     LOGIN_URL = "https://workflowy.com/ajax_login"  # Login Endpoint URL
     API_URL = "https://workflowy.com/%s"
     TIMEOUT = 5
+    MAX_BATCH_OPERATIONS = 1000
+    MAX_BATCH_BYTES = 256 * 1024
 
-    def __init__(self, session_id=False):
+    def __init__(self, session_id=False, session_manager=None):
         """
         Initializes a new instance of the WorkFlowyTransport class.
 
         Args:
             session_id (str, optional): The session ID for making API calls. Defaults to False.
+            session_manager (WorkFlowySessionManager, optional): The manager providing and renewing the session ID. Defaults to None.
 
         Raises:
             WorkFlowyException: If an invalid session ID is provided.
         """
-        self.session = requests.Session()
+        self.local = threading.local()
+        self.lock = threading.RLock()
 
         if (
             session_id is not False
@@ -45,10 +62,23 @@ class WorkFlowyTransport:
         ):
             raise WorkFlowyException("Invalid session ID")
         self.session_id = session_id
+        self.session_manager = session_manager
         self.client_version = 21
         self.client_id = None
         self.most_recent_operation_transaction_id = None
 
+    @property
+    def session(self):
+        """
+        The requests session of the current thread.
+
+        Returns:
+            requests.Session: The session.
+        """
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
     def listRequest(self, action: str, data: dict = {}):
         """
         Handles push_and_poll requests.
@@ -57,27 +87,58 @@ class WorkFlowyTransport:
             action (str): The action type for the request.
             data (dict, optional): The data for the request. Defaults to {}.
 
+        Returns:
+            dict: The response from the API.
+
         Raises:
             WorkFlowyException: If an invalid API request is provided.
         """
         if not isinstance(action, str) or not isinstance(data, dict):
             raise WorkFlowyException("Invalid API request")
 
-        request_data = {
-            "client_id": self.client_id,
-            "client_version": self.client_version,
-            "push_poll_id": self.__generate_uuid(),
-            "push_poll_data": json.dumps(
-                [
-                    {
-                        "most_recent_operation_transaction_id": self.most_recent_operation_transaction_id,
-                        "operations": [{"type": action, "data": data}],
-                    }
-                ]
-            ),
-        }
+        return self.push_and_poll([{"type": action, "data": data}])
+
+    def push_and_poll(self, operations: list = []):
+        """
+        Pushes the given operations and polls for the changes made since the most recent known transaction.
+
+        An empty list of operations only polls for changes.
+
+        Args:
+            operations (list, optional): The operations to push, as dicts with "type" and "data" keys. Defaults to [].
+
+        Returns:
+            dict: The response from the API.
+
+        Raises:
+            WorkFlowyException: If an invalid API request is provided.
+        """
+        if not isinstance(operations, list):
+            raise WorkFlowyException("Invalid API request")
+
+        with self.lock:
+            request_data = {
+                "client_id": self.client_id,
+                "client_version": self.client_version,
+                "push_poll_id": self.__generate_uuid(),
+                "push_poll_data": json.dumps(
+                    [
+                        {
+                            "most_recent_operation_transaction_id": self.most_recent_operation_transaction_id,
+                            "operations": operations,
+                        }
+                    ]
+                ),
+            }
+
+            response = self.__api_request("push_and_poll", request_data)
+
+            # Keep track of the transaction the local tree is in sync with
+            results = response.get("results") if isinstance(response, dict) else None
+            if results and results[0].get("new_most_recent_operation_transaction_id"):
+                self.most_recent_operation_transaction_id = results[0]["new_most_recent_operation_transaction_id"]
 
-        self.__api_request("push_and_poll", request_data)
+            return response
 
     def get_initialization_data(self):
         """
@@ -104,24 +165,57 @@ class WorkFlowyTransport:
 
         Raises:
             WorkFlowyException: If an invalid API request is provided or a session ID is not available.
+            WorkFlowyAuthException: If the session ID is rejected and cannot be renewed.
             WorkFlowyException: If an HTTP error occurs during the request.
             WorkFlowyException: If an error occurs during the request.
         """
+        if not isinstance(endpoint, str) or not isinstance(data, dict):
+            raise WorkFlowyException("Invalid API request")
+
+        if self.session_id is False and self.session_manager is not None:
+            self.session_id = self.session_manager.get_session_id()
         if self.session_id is False:
             raise WorkFlowyException("A session ID is needed to make API calls.")
 
-        if not isinstance(endpoint, str) or not isinstance(data, dict):
-            raise WorkFlowyException("Invalid API request")
+        session_id = self.session_id
+        try:
+            return self.__send_request(endpoint, data, session_id)
+        except WorkFlowyAuthException:
+            if self.session_manager is None:
+                raise
+            # Threads rejected with the same session share a single login
+            self.session_id = self.session_manager.refresh(session_id)
+        return self.__send_request(endpoint, data, self.session_id)
+
+    def __send_request(self, endpoint, data, session_id):
+        """
+        Sends a single API request.
 
+        Args:
+            endpoint (str): The API endpoint.
+            data (dict): The data for the request.
+            session_id (str): The session ID to send.
+
+        Returns:
+            dict: The response from the API.
+
+        Raises:
+            WorkFlowyAuthException: If the session ID is rejected.
+            WorkFlowyException: If an HTTP error occurs during the request.
+            WorkFlowyException: If an error occurs during the request.
+        """
         url = self.API_URL % endpoint
         headers = {
             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
             "Accept": "application/json",
-            "Cookie": "sessionid=%s" % self.session_id,
+            "Cookie": "sessionid=%s" % session_id,
         }
 
         try:
             response = self.session.post(url, data=data, headers=headers)
+            # Expired sessions are refused or redirected to the login page
+            if response.status_code in (401, 403) or (response.history and "/login" in response.url):
+                raise WorkFlowyAuthException("Session ID rejected")
             response.raise_for_status()
             response = response.json()
             return response
@@ -160,6 +254,10 @@ class WorkFlowyTransport:
             response = self.session.post(self.LOGIN_URL, data=data, headers=headers)
             response.raise_for_status()
 
+            sessionid = response.cookies.get("sessionid")
+            if sessionid:
+                return sessionid
+
             if "set-cookie" in response.headers:
                 # Split the string to get the sessionid
                 set_cookie_header = response.headers["set-cookie"]
@@ -0,0 +1,274 @@
+from workflowy_exception import WorkFlowyException
+import asyncio, threading, time
+
+class WorkFlowyWatcher:
+    """
+    Watches a WorkFlowy project for changes made by other clients and dispatches them to callbacks.
+
+    The watcher polls with push_and_poll, which only returns the operations made since the most recent
+    known transaction, instead of downloading the whole tree again. The poll interval starts at
+    min_interval and grows by backoff up to max_interval while nothing changes. Changes arriving within
+    coalesce_window of each other are dispatched together, with repeated events on the same list merged.
+
+    Callbacks are called with the affected WorkFlowyList. Exceptions raised by callbacks or by polling, network
+    errors included, are stored in last_error and do not stop the watcher. After a failed poll the interval
+    grows by backoff, as after a poll without changes.
+
+    Attributes:
+        EVENTS (tuple): The event types callbacks can be registered for.
+        project (WorkFlowyProject): The project being watched. Its main list must have been built.
+        min_interval (float): The shortest time between polls, in seconds.
+        max_interval (float): The longest time between polls, in seconds.
+        backoff (float): The factor the poll interval grows by after a poll without changes.
+        coalesce_window (float): The longest time changes are buffered before being dispatched, in seconds.
+        last_error (Exception): The last exception raised while polling or dispatching, or None.
+        lock (threading.Lock): The lock serialising polls, so that other threads can poll with the watcher.
+    """
+
+    EVENTS = ('created', 'edited', 'moved', 'completed', 'uncompleted', 'deleted')
+
+    def __init__(self, project, min_interval: float = 1.0, max_interval: float = 30.0, backoff: float = 2.0, coalesce_window: float = 2.0):
+        """
+        Initializes a WorkFlowyWatcher object.
+
+        Args:
+            project (WorkFlowyProject): The project to watch.
+            min_interval (float, optional): The shortest time between polls, in seconds. Defaults to 1.0.
+            max_interval (float, optional): The longest time between polls, in seconds. Defaults to 30.0.
+            backoff (float, optional): The factor the poll interval grows by when nothing changes. Defaults to 2.0.
+            coalesce_window (float, optional): The longest time changes are buffered, in seconds. Defaults to 2.0.
+
+        Raises:
+            WorkFlowyException: If the intervals are invalid.
+        """
+        if min_interval <= 0 or max_interval < min_interval or backoff < 1:
+            raise WorkFlowyException('Invalid poll intervals')
+
+        self.project = project
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.coalesce_window = coalesce_window
+        self.last_error = None
+        self.callbacks = {event: [] for event in self.EVENTS}
+        self.interval = min_interval
+        self.pending = []
+        self.burst_started = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+
+    def on(self, event: str, callback):
+        """
+        Register a callback for an event type.
+
+        Args:
+            event (str): One of EVENTS.
+            callback (callable): The function to call with the affected WorkFlowyList.
+
+        Raises:
+            WorkFlowyException: If the event type is unknown or the callback is not callable.
+        """
+        if event not in self.callbacks:
+            raise WorkFlowyException(f"Unknown event {event}")
+        if not callable(callback):
+            raise WorkFlowyException('Callback must be callable')
+        self.callbacks[event].append(callback)
+
+
+    def on_created(self, callback):
+        """
+        Register a callback for lists created by other clients.
+
+        Args:
+            callback (callable): The function to call with the created WorkFlowyList.
+        """
+        self.on('created', callback)
+
+
+    def on_edited(self, callback):
+        """
+        Register a callback for lists renamed or redescribed by other clients.
+
+        Args:
+            callback (callable): The function to call with the edited WorkFlowyList.
+        """
+        self.on('edited', callback)
+
+
+    def on_moved(self, callback):
+        """
+        Register a callback for lists moved by other clients.
+
+        Args:
+            callback (callable): The function to call with the moved WorkFlowyList.
+        """
+        self.on('moved', callback)
+
+
+    def on_completed(self, callback):
+        """
+        Register a callback for lists completed by other clients.
+
+        Args:
+            callback (callable): The function to call with the completed WorkFlowyList.
+        """
+        self.on('completed', callback)
+
+
+    def on_uncompleted(self, callback):
+        """
+        Register a callback for lists marked as incomplete by other clients.
+
+        Args:
+            callback (callable): The function to call with the WorkFlowyList.
+        """
+        self.on('uncompleted', callback)
+
+
+    def on_deleted(self, callback):
+        """
+        Register a callback for lists deleted by other clients.
+
+        Args:
+            callback (callable): The function to call with the deleted WorkFlowyList, already removed from the tree.
+        """
+        self.on('deleted', callback)
+
+
+    def poll(self):
+        """
+        Poll once and update the poll interval. A failed poll is stored in last_error and returns no new events.
+        Can be called from any thread, for example to poll immediately while the watcher is running.
+
+        Returns:
+            list: The coalesced (event, WorkFlowyList) tuples that are ready to be dispatched.
+        """
+        with self.lock:
+            return self.__poll()
+
+
+    def __poll(self):
+        """
+        Poll once and update the poll interval. Must be called while holding the lock.
+
+        Returns:
+            list: The coalesced (event, WorkFlowyList) tuples that are ready to be dispatched.
+        """
+        try:
+            events = self.project.poll_changes()
+        except Exception as e:
+            self.last_error = e
+            events = []
+        now = time.monotonic()
+
+        if events:
+            # Poll quickly while a burst of changes is coming in
+            self.pending.extend(events)
+            if self.burst_started is None:
+                self.burst_started = now
+            self.interval = self.min_interval
+            if now - self.burst_started < self.coalesce_window:
+                return []
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        ready = self.__coalesce(self.pending)
+        self.pending = []
+        self.burst_started = None
+        return ready
+
+
+    def dispatch(self, events: list):
+        """
+        Call the registered callbacks for the given events.
+
+        Args:
+            events (list): The (event, WorkFlowyList) tuples to dispatch.
+        """
+        for event, sublist in events:
+            for callback in self.callbacks.get(event, ()):
+                try:
+                    callback(sublist)
+                except Exception as e:
+                    self.last_error = e
+
+
+    def start(self):
+        """
+        Start watching on a background thread.
+
+        Raises:
+            WorkFlowyException: If the watcher is already running.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            raise WorkFlowyException('Watcher is already running')
+
+        self.stop_event.clear()
+        self.project.record_events = True
+        self.thread = threading.Thread(target=self.__run, name='WorkFlowyWatcher', daemon=True)
+        self.thread.start()
+
+
+    def stop(self, timeout: float = None):
+        """
+        Stop the background thread or asyncio task and wait for it to finish.
+
+        Args:
+            timeout (float, optional): The longest time to wait for the thread, in seconds. Defaults to None (no limit).
+        """
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+        self.project.record_events = False
+
+
+    async def run_async(self):
+        """
+        Watch from an asyncio task until stop() is called. Polls run in the default executor and
+        callbacks are called on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        self.stop_event.clear()
+        self.project.record_events = True
+        try:
+            while not self.stop_event.is_set():
+                await asyncio.sleep(self.interval)
+                if self.stop_event.is_set():
+                    break
+                try:
+                    self.dispatch(await loop.run_in_executor(None, self.poll))
+                except Exception as e:
+                    self.last_error = e
+        finally:
+            self.project.record_events = False
+
+
+    def __run(self):
+        """
+        Poll and dispatch on the background thread until stop() is called.
+        """
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.dispatch(self.poll())
+            except Exception as e:
+                # Nothing may end the thread but stop()
+                self.last_error = e
+
+
+    def __coalesce(self, events: list):
+        """
+        Merge repeated events on the same list, keeping the order of their first occurrence.
+
+        Args:
+            events (list): The (event, WorkFlowyList) tuples.
+
+        Returns:
+            list: The merged (event, WorkFlowyList) tuples.
+        """
+        merged = {}
+        for event, sublist in events:
+            merged[(event, id(sublist))] = (event, sublist)
+        return list(merged.values())